@@ -0,0 +1,295 @@
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from core import (
+    apply_scaling,
+    collect_writes,
+    compile_definition,
+    decode_map,
+    get_cell_data_type,
+    get_struct,
+    read_from_binary,
+    reverse_scaling,
+)
+from storage import BinaryImage
+
+# Benchmark cases as (maps, rows, columns, binary size in MB); binaries grow when the maps do not fit
+CASES = [
+    (10, 6, 4, 1),
+    (100, 16, 16, 1),
+    (1000, 6, 4, 2),
+    (1000, 16, 16, 4),
+    (1000, 32, 32, 4),
+    (5000, 6, 4, 4),
+    (5000, 16, 16, 8),
+]
+QUICK_CASES = [(10, 6, 4, 1), (100, 16, 16, 1), (1000, 6, 4, 2)]
+MAPS_PER_GROUP = 50
+# Every tenth map goes into editable_maps instead of a group
+EDITABLE_MAP_EVERY = 10
+# Offset of the first generated region
+HEADER_SIZE = 0x1000
+
+# Function to generate a definition in the map_groups/editable_maps schema; returns (json_data, bytes needed)
+def generate_definition(maps, rows, columns):
+    cursor = HEADER_SIZE
+    groups = []
+    editable_maps = []
+    for index in range(maps):
+        if index % MAPS_PER_GROUP == 0:
+            group_index = len(groups)
+            # The control slider scales every cell of the group's multiplier map
+            multiplier_map = {
+                "name": f"Group_{group_index}_Multiplier",
+                "description": "Map scaled by the group's control slider.",
+                "offset": f"0x{cursor:X}",
+                "length": rows * columns,
+                "data_type": "array",
+                "sign_type": "unsigned",
+                "input_type": "map_multiplier",
+                "map_dimension": {"rows": rows, "columns": columns},
+                "scaling": {"factor": 0.375, "offset": -35.625},
+            }
+            cursor += rows * columns
+            groups.append({
+                "group_name": f"Group_{group_index}",
+                "description": "Generated group.",
+                "maps": [multiplier_map],
+                "control_slider": {
+                    "name": f"Group_{group_index}_Control",
+                    "description": "Generated control slider.",
+                    "min_value": 0.5,
+                    "max_value": 1.5,
+                    "step": 0.05,
+                    "default_value": 1.0,
+                },
+            })
+
+        # Mix cell sizes, signs and the ways editable cells are declared
+        cell_length = 1 if index % 4 == 3 else 2
+        map_dimension = {"rows": rows, "columns": columns, "x_axis_name": "RPM", "y_axis_name": "Load"}
+        if index % 3 == 0:
+            map_dimension["editable_columns"] = "all"
+        elif index % 3 == 1:
+            map_dimension["editable_columns"] = list(range(0, columns, 2))
+        else:
+            map_dimension["editable_region"] = {"start_row": 1, "end_row": rows - 1, "start_column": 1, "end_column": columns - 1}
+        x_axis_offset = cursor
+        cursor += columns * 2
+        item = {
+            "name": f"Map_{index}",
+            "description": "Generated map.",
+            "offset": f"0x{cursor:X}",
+            "length": rows * columns * cell_length,
+            "data_type": "array",
+            "sign_type": "signed" if index % 2 else "unsigned",
+            "input_type": "map_editor",
+            "map_dimension": map_dimension,
+            "x_axis": {"start_offset": f"0x{x_axis_offset:X}", "length": columns * 2, "data_type": "int16", "sign_type": "unsigned"},
+            "scaling": {"factor": 0.5 if cell_length == 2 else 0.1, "offset": -40 if index % 2 else 0},
+        }
+        cursor += rows * columns * cell_length
+        if index % EDITABLE_MAP_EVERY == EDITABLE_MAP_EVERY - 1:
+            editable_maps.append(item)
+        else:
+            groups[-1]["maps"].append(item)
+    json_data = {"calibration_id": f"BENCH_{maps}x{rows}x{columns}", "map_groups": groups, "editable_maps": editable_maps}
+    return json_data, cursor
+
+# Function to generate a binary of random bytes
+def generate_binary(size, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, size, dtype=np.uint8).tobytes()
+
+# Function to build edited tables in which every editable cell moves by one raw step
+def generate_edits(binary_data, tables):
+    values = {}
+    for layout in tables:
+        raw = np.frombuffer(binary_data, dtype=layout.dtype, count=layout.rows * layout.columns, offset=layout.offset)
+        edited = (raw ^ 1).astype(np.float64).reshape(layout.rows, layout.columns)
+        if layout.scaling:
+            edited = apply_scaling(edited, *layout.scaling)
+        values[layout.name] = np.where(layout.editable_mask, edited, np.nan)
+    return values
+
+# Function to get the struct codec of one cell of a table, as the per-cell loop uses it
+def cell_codec(layout):
+    sign_type = "signed" if layout.dtype.kind == "i" else "unsigned"
+    return get_struct(get_cell_data_type(layout.dtype.itemsize), sign_type)
+
+# Function to decode every table one cell at a time, as the editor did before the vectorized codec
+def per_cell_decode(binary_data, tables):
+    decoded = {}
+    for layout in tables:
+        codec = cell_codec(layout)
+        values = []
+        for row in range(layout.rows):
+            row_values = []
+            for column in range(layout.columns):
+                cell_offset = layout.offset + (row * layout.columns + column) * codec.size
+                row_values.append(read_from_binary(binary_data, cell_offset, codec, layout.scaling))
+            values.append(row_values)
+        decoded[layout.name] = values
+    return decoded
+
+# Function to encode every editable cell one at a time into a copy of the binary, as the editor did before
+def per_cell_save(binary_data, tables, values):
+    modified = bytearray(binary_data)
+    for layout in tables:
+        codec = cell_codec(layout)
+        table = values[layout.name]
+        for row in range(layout.rows):
+            for column in range(layout.columns):
+                if not layout.editable_mask[row, column]:
+                    continue
+                value = float(table[row, column])
+                if layout.scaling:
+                    value = reverse_scaling(value, *layout.scaling)
+                cell_offset = layout.offset + (row * layout.columns + column) * codec.size
+                codec.pack_into(modified, cell_offset, round(value))
+    return modified
+
+# Function to scale every cell of the groups' multiplier maps one at a time, clamped to the cell type's range
+def per_cell_multiplier(binary_data, definition, multiplier):
+    modified = bytearray(binary_data)
+    for group in definition.groups:
+        for layout in group.maps:
+            if layout.input_type != "map_multiplier":
+                continue
+            codec = cell_codec(layout)
+            low, high = (-(1 << (8 * codec.size - 1)), (1 << (8 * codec.size - 1)) - 1) if layout.dtype.kind == "i" else (0, (1 << (8 * codec.size)) - 1)
+            for cell in range(layout.rows * layout.columns):
+                cell_offset = layout.offset + cell * codec.size
+                value = round(codec.unpack_from(binary_data, cell_offset)[0] * multiplier)
+                codec.pack_into(modified, cell_offset, min(max(value, low), high))
+    return modified
+
+# Function to time a callable; returns the best of several runs in seconds
+def best_time(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# Function to run every stage of one case; returns one result record per stage and engine
+def run_case(maps, rows, columns, size_mb, repeat, per_cell):
+    json_data, needed = generate_definition(maps, rows, columns)
+    size = max(size_mb << 20, needed)
+    definition_text = json.dumps(json_data)
+    definition = compile_definition(json.loads(definition_text))
+    if definition.issues:
+        raise ValueError(f"Generated definition has issues: {definition.issues[0][1]}")
+    binary_data = generate_binary(size)
+    tables = [layout for layout in (*(layout for group in definition.groups for layout in group.maps), *definition.editable_maps)
+              if layout.input_type == "map_editor"]
+    edits = generate_edits(binary_data, tables)
+    multipliers = {group.control_slider.name: 1.1 for group in definition.groups}
+    cells = sum(layout.rows * layout.columns for layout in tables)
+    editable_cells = sum(int(layout.editable_mask.sum()) for layout in tables)
+
+    # Function to save the edits the way the editor does: pending writes into the image's overlay
+    def save():
+        image = BinaryImage(binary_data)
+        writes, _ = collect_writes(image.buffer, definition, edits)
+        image.write(writes)
+        image.patch()
+        return image
+
+    saved_image = save()
+    per_cell_saved = per_cell_save(binary_data, tables, edits) if per_cell else None
+    stages = [
+        ("parse", "current", lambda: compile_definition(json.loads(definition_text))),
+        ("decode", "current", lambda: [decode_map(binary_data, layout.offset, layout.rows, layout.columns, layout.dtype, layout.scaling)
+                                       for layout in tables]),
+        ("save", "current", save),
+        ("multiplier", "current", lambda: collect_writes(binary_data, definition, multipliers)),
+        ("download", "current", saved_image.to_bytes),
+    ]
+    if per_cell:
+        stages += [
+            ("decode", "per_cell", lambda: per_cell_decode(binary_data, tables)),
+            ("save", "per_cell", lambda: per_cell_save(binary_data, tables, edits)),
+            ("multiplier", "per_cell", lambda: per_cell_multiplier(binary_data, definition, 1.1)),
+            ("download", "per_cell", lambda: bytes(per_cell_saved)),
+        ]
+    case = f"{maps}x{rows}x{columns}@{size_mb}MB"
+    results = []
+    for stage, engine, function in stages:
+        results.append({
+            "case": case,
+            "maps": maps,
+            "rows": rows,
+            "columns": columns,
+            "binary_size": size,
+            "cells": cells,
+            "editable_cells": editable_cells,
+            "stage": stage,
+            "engine": engine,
+            "seconds": best_time(function, repeat),
+        })
+    if per_cell and bytes(per_cell_saved) != saved_image.to_bytes():
+        raise ValueError(f"Case {case}: the current and per-cell engines saved different binaries.")
+    if per_cell:
+        multiplied_image = BinaryImage(binary_data)
+        multiplied_image.write(collect_writes(binary_data, definition, multipliers)[0])
+        if bytes(per_cell_multiplier(binary_data, definition, 1.1)) != multiplied_image.to_bytes():
+            raise ValueError(f"Case {case}: the current and per-cell engines scaled the multiplier maps differently.")
+    return results
+
+# Function to load results written by an earlier run, keyed by (case, stage, engine)
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return {(record["case"], record["stage"], record["engine"]): record for record in map(json.loads, filter(str.strip, f))}
+
+# Function to run the benchmark cases and write the results as JSON lines
+def run_benchmarks(args):
+    baseline = load_results(args.baseline) if args.baseline else {}
+    environment = {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine()}
+    regressions = 0
+    with open(args.output, "w", encoding="utf-8") as f:
+        for maps, rows, columns, size_mb in QUICK_CASES if args.quick else CASES:
+            results = run_case(maps, rows, columns, size_mb, args.repeat, not args.skip_per_cell)
+            timings = {(record["stage"], record["engine"]): record["seconds"] for record in results}
+            for record in results:
+                record.update(environment)
+                f.write(json.dumps(record) + "\n")
+                line = f"{record['case']:<22} {record['stage']:<11} {record['engine']:<9} {record['seconds'] * 1000:10.2f} ms"
+                if record["engine"] == "current" and (record["stage"], "per_cell") in timings:
+                    line += f"  {timings[(record['stage'], 'per_cell')] / max(record['seconds'], 1e-9):8.2f}x speedup over per-cell"
+                previous = baseline.get((record["case"], record["stage"], record["engine"]))
+                if previous:
+                    ratio = record["seconds"] / max(previous["seconds"], 1e-9)
+                    line += f"  {ratio:5.2f}x baseline"
+                    if ratio > args.tolerance:
+                        line += "  REGRESSION"
+                        regressions += 1
+                print(line)
+    print(f"Results written to {args.output}.")
+    if regressions:
+        print(f"{regressions} timing(s) are more than {args.tolerance}x slower than the baseline.", file=sys.stderr)
+        return 1
+    return 0
+
+# Function to build the command-line parser
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the editor's core paths on synthetic definitions and binaries.")
+    parser.add_argument("--output", default="bench_output.txt", help="Path of the JSON lines results file.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per timing; the best run is reported.")
+    parser.add_argument("--quick", action="store_true", help="Only run the small cases.")
+    parser.add_argument("--skip-per-cell", action="store_true", help="Do not time the per-cell reference loops.")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="Slowdown relative to the baseline that counts as a regression.")
+    return parser
+
+def main(argv=None):
+    return run_benchmarks(build_parser().parse_args(argv))
+
+if __name__ == "__main__":
+    sys.exit(main())
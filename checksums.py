@@ -0,0 +1,204 @@
+import functools
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+
+# Size of the blocks a checksum keeps one partial value for; edits only rehash the blocks they touch
+BLOCK_SIZE = 4096
+
+# Function to multiply a GF(2) 32x32 matrix, given as the images of each bit, by a 32-bit vector
+def gf2_times(matrix, vector):
+    result = 0
+    bit = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[bit]
+        vector >>= 1
+        bit += 1
+    return result
+
+# Function to build byte lookup tables for the CRC-32 operator that appends length zero bytes,
+# so CRCs of consecutive blocks can be combined without rehashing (as zlib's crc32_combine does)
+@functools.lru_cache(maxsize=16)
+def crc32_shift_tables(length):
+    # Operator for one zero bit: the reflected polynomial for bit 0, a shift for the others
+    zero_bit = [0xEDB88320] + [1 << bit for bit in range(31)]
+    operator = [1 << bit for bit in range(32)]
+    power = zero_bit
+    for _ in range(3):
+        power = [gf2_times(power, power[bit]) for bit in range(32)]
+    # power is now the operator for one zero byte; square it for each bit of length
+    while length:
+        if length & 1:
+            operator = [gf2_times(power, operator[bit]) for bit in range(32)]
+        length >>= 1
+        if length:
+            power = [gf2_times(power, power[bit]) for bit in range(32)]
+    return [[gf2_times(operator, byte << (8 * shift)) for byte in range(256)] for shift in range(4)]
+
+# Function to shift a CRC-32 with tables from crc32_shift_tables
+def crc32_shift(tables, crc):
+    return tables[0][crc & 0xFF] ^ tables[1][(crc >> 8) & 0xFF] ^ tables[2][(crc >> 16) & 0xFF] ^ tables[3][crc >> 24]
+
+# CRC-32 (zlib) kept as one CRC per block and combined with the zero-byte shift operator
+class Crc32:
+    size = 4
+
+    # Function to compute the partial value of each block
+    def partials(self, data, block_size):
+        return np.array([zlib.crc32(data[start:start + block_size]) for start in range(0, len(data), block_size)], dtype=np.uint64)
+
+    # Function to combine the partial values of consecutive blocks into the checksum
+    def combine(self, partials, block_size, length):
+        tables = crc32_shift_tables(block_size)
+        last_length = length - (len(partials) - 1) * block_size
+        crc = 0
+        for index, partial in enumerate(partials.tolist()):
+            if index == 0:
+                crc = partial
+            elif index == len(partials) - 1 and last_length != block_size:
+                crc = crc32_shift(crc32_shift_tables(last_length), crc) ^ partial
+            else:
+                crc = crc32_shift(tables, crc) ^ partial
+        return crc
+
+# Sum of the region's words, truncated to the stored size
+class WordSum:
+    def __init__(self, word_size, size):
+        self.word_size = word_size
+        self.size = size
+        self.byteorder = "little"
+
+    # Function to compute the partial value of each block
+    def partials(self, data, block_size):
+        words = np.frombuffer(data, dtype=f"{'<' if self.byteorder == 'little' else '>'}u{self.word_size}").astype(np.uint64)
+        return np.add.reduceat(words, np.arange(0, len(words), block_size // self.word_size)) if len(words) else np.zeros(0, dtype=np.uint64)
+
+    # Function to combine the partial values of consecutive blocks into the checksum
+    def combine(self, partials, block_size, length):
+        return int(partials.sum(dtype=np.uint64)) & ((1 << (8 * self.size)) - 1)
+
+# Checksum algorithms a definition can declare, by name
+ALGORITHMS = {
+    "crc32": lambda: Crc32(),
+    "sum8": lambda: WordSum(1, 1),
+    "sum16": lambda: WordSum(2, 2),
+    "sum32": lambda: WordSum(4, 4),
+}
+
+# How the combined value is stored
+VARIANTS = ("sum", "ones_complement", "twos_complement")
+
+# Compiled checksum of the definition: the value over [start, end) stored at offset
+@dataclass(slots=True)
+class ChecksumLayout:
+    name: str
+    algorithm: str
+    start: int
+    end: int
+    offset: int
+    byteorder: str
+    variant: str
+    block_size: int
+    engine: object
+
+    @property
+    def size(self):
+        return self.engine.size
+
+    # Key of the partial values of this checksum, for caching them per image
+    @property
+    def key(self):
+        return (self.algorithm, self.start, self.end, self.byteorder, self.block_size)
+
+    # Function to compute the partial values of the region's blocks
+    def partials(self, binary_data):
+        if self.end > len(binary_data) or self.offset + self.size > len(binary_data):
+            raise ValueError(f"Checksum '{self.name}' covers {hex(self.start)}-{hex(self.end - 1)} and is stored at {hex(self.offset)}, "
+                             f"beyond the binary of {len(binary_data)} bytes.")
+        partials = self.engine.partials(memoryview(binary_data)[self.start:self.end], self.block_size)
+        partials.setflags(write=False)
+        return partials
+
+    # Function to turn the partial values into the bytes stored at offset
+    def value_bytes(self, partials):
+        value = self.engine.combine(partials, self.block_size, self.end - self.start)
+        mask = (1 << (8 * self.size)) - 1
+        if self.variant == "ones_complement":
+            value = ~value & mask
+        elif self.variant == "twos_complement":
+            value = -value & mask
+        return value.to_bytes(self.size, self.byteorder)
+
+# Function to compile one entry of the definition's checksums, or None if it cannot be used
+def compile_checksum(item, issues):
+    name = item.get("name", "Unnamed checksum")
+    algorithm = item.get("algorithm")
+    if algorithm not in ALGORITHMS:
+        issues.append(("error", f"Checksum '{name}' has unsupported algorithm '{algorithm}'. Supported: {', '.join(ALGORITHMS)}."))
+        return None
+    try:
+        start = int(item.get("start"), 16)
+        end = int(item.get("end"), 16)
+        offset = int(item.get("offset"), 16)
+    except (TypeError, ValueError):
+        issues.append(("error", f"Checksum '{name}' needs hex 'start', 'end' and 'offset' values."))
+        return None
+    engine = ALGORITHMS[algorithm]()
+    byteorder = item.get("byteorder", "little")
+    variant = item.get("variant", "sum")
+    block_size = item.get("block_size", BLOCK_SIZE)
+    if byteorder not in ("little", "big"):
+        issues.append(("error", f"Checksum '{name}' has invalid byteorder '{byteorder}'."))
+        return None
+    if variant not in VARIANTS:
+        issues.append(("error", f"Checksum '{name}' has invalid variant '{variant}'. Supported: {', '.join(VARIANTS)}."))
+        return None
+    if not 0 <= start < end:
+        issues.append(("error", f"Checksum '{name}' has an empty range {hex(start)}-{hex(end)}."))
+        return None
+    if offset < end and offset + engine.size > start:
+        issues.append(("error", f"Checksum '{name}' is stored at {hex(offset)}, inside the range it covers."))
+        return None
+    if not isinstance(block_size, int) or block_size <= 0:
+        issues.append(("error", f"Checksum '{name}' has invalid block_size '{block_size}'."))
+        return None
+    if isinstance(engine, WordSum):
+        engine.byteorder = byteorder
+        if (end - start) % engine.word_size or block_size % engine.word_size:
+            issues.append(("error", f"Checksum '{name}' range and block size must be multiples of {engine.word_size} bytes."))
+            return None
+    return ChecksumLayout(name, algorithm, start, end, offset, byteorder, variant, block_size, engine)
+
+# Function to get the patched bytes of [start, end)
+def patched_range(binary_data, patch, start, end):
+    data = bytearray(binary_data[start:end])
+    patch.apply_to(data, start)
+    return bytes(data)
+
+# Function to recompute a checksum after a patch by rehashing only the blocks the patch touches.
+# get_partials(checksum) may return cached partial values of the original image.
+# Returns (write or None, report).
+def correct_checksum(binary_data, patch, checksum, get_partials=None):
+    original_partials = get_partials(checksum) if get_partials else checksum.partials(binary_data)
+    first, last = patch.span(checksum.start, checksum.end)
+    blocks = np.unique((patch.positions[first:last] - checksum.start) // checksum.block_size).tolist()
+    partials = original_partials.copy()
+    for block in blocks:
+        block_start = checksum.start + block * checksum.block_size
+        block_end = min(block_start + checksum.block_size, checksum.end)
+        block_data = patched_range(binary_data, patch, block_start, block_end)
+        partials[block] = checksum.engine.partials(block_data, checksum.block_size)[0]
+    new = checksum.value_bytes(partials)
+    stored = patched_range(binary_data, patch, checksum.offset, checksum.offset + checksum.size)
+    report = {
+        "name": checksum.name,
+        "algorithm": checksum.algorithm,
+        "offset": hex(checksum.offset),
+        "old": stored.hex(),
+        "new": new.hex(),
+        "dirty_blocks": len(blocks),
+        "blocks": len(partials),
+    }
+    return ((checksum.offset, new) if new != stored else None), report
@@ -0,0 +1,259 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from compare import compare_binaries
+from core import apply_patch, check_values, compile_definition, load_definition_file, patch_to_json
+from pipeline import prepare_save
+from relocate import relocate_definition
+from storage import BinaryImage
+from validate import validate_definition
+
+BINARY_EXTENSIONS = (".bin", ".dat", ".exe")
+
+# Definition and tune loaded once per worker process
+_worker_state = {}
+
+# Function to load the definition and tune into a worker process
+def init_apply_worker(definition_path, tune_path, output_dir, write_patches):
+    _worker_state["definition"] = load_definition_file(definition_path)
+    with open(tune_path, "r", encoding="utf-8") as f:
+        _worker_state["tune"] = json.load(f)
+    _worker_state["output_dir"] = output_dir
+    _worker_state["write_patches"] = write_patches
+
+# Function to apply the tune to one binary and write its output; returns the file's report entry
+def apply_tune_to_file(path):
+    definition = _worker_state["definition"]
+    output_dir = _worker_state["output_dir"]
+    report = {"input": path, "status": "ok", "issues": []}
+    try:
+        with BinaryImage.open(path) as image:
+            # Edits and checksum corrections go into the image's overlay
+            issues, checksums = prepare_save(image, definition, _worker_state["tune"])
+            report["issues"] = [{"level": level, "message": message} for level, message in issues]
+            report["checksums"] = checksums
+            patch = image.patch()
+            # Stream the original plus the overlay to disk, hashing as it goes
+            output_path = os.path.join(output_dir, os.path.basename(path))
+            output_hash = hashlib.sha256()
+            with open(output_path, "wb") as f:
+                for chunk in image.iter_chunks():
+                    f.write(chunk)
+                    output_hash.update(chunk)
+            source_sha256 = image.source_sha256()
+            if _worker_state["write_patches"]:
+                with open(output_path + ".patch.json", "w", encoding="utf-8") as f:
+                    f.write(patch_to_json(patch, definition.calibration_id, source_sha256, len(image)))
+        report.update({
+            "output": output_path,
+            "source_sha256": source_sha256,
+            "output_sha256": output_hash.hexdigest(),
+            "changed_bytes": patch.changed_bytes,
+            "changed_regions": patch.regions,
+        })
+        if any(level == "error" for level, _ in issues):
+            report["status"] = "error"
+    except (OSError, ValueError) as e:
+        report["status"] = "error"
+        report["issues"].append({"level": "error", "message": str(e)})
+    return report
+
+# Function to list the binaries to process in a directory
+def find_binaries(input_dir):
+    return sorted(
+        os.path.join(input_dir, name)
+        for name in os.listdir(input_dir)
+        if name.lower().endswith(BINARY_EXTENSIONS) and os.path.isfile(os.path.join(input_dir, name))
+    )
+
+# Function to apply a tune to every binary in a directory with a process pool
+def run_apply(args):
+    definition = load_definition_file(args.definition)
+    for level, message in definition.issues:
+        print(f"{level}: {message}", file=sys.stderr)
+    # Check the tune once, so a typo or bad value fails the run instead of silently changing nothing
+    try:
+        with open(args.tune, "r", encoding="utf-8") as f:
+            tune = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"error: {args.tune}: {e}", file=sys.stderr)
+        return 1
+    tune_issues = check_values(definition, tune)
+    for level, message in tune_issues:
+        print(f"{level}: {args.tune}: {message}", file=sys.stderr)
+    if tune_issues:
+        return 1
+    binaries = find_binaries(args.input_dir)
+    if not binaries:
+        print(f"No binaries found in {args.input_dir}.", file=sys.stderr)
+        return 1
+    if os.path.realpath(args.input_dir) == os.path.realpath(args.output_dir):
+        print("The output directory must differ from the input directory.", file=sys.stderr)
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+    initargs = (args.definition, args.tune, args.output_dir, args.patches)
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_apply_worker, initargs=initargs) as executor:
+        reports = list(executor.map(apply_tune_to_file, binaries, chunksize=max(1, len(binaries) // 64)))
+    report_path = os.path.join(args.output_dir, "report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"definition": args.definition, "tune": args.tune, "files": reports}, f, indent=2)
+    failed = sum(report["status"] != "ok" for report in reports)
+    print(f"Processed {len(reports)} file(s), {failed} with errors. Report written to {report_path}.")
+    return 1 if failed else 0
+
+# Function to compare every defined parameter across several binaries
+def run_compare(args):
+    definition = load_definition_file(args.definition)
+    images = [BinaryImage.open(path) for path in args.binaries]
+    try:
+        comparisons, issues = compare_binaries(definition, [image.buffer for image in images])
+    finally:
+        for image in images:
+            image.close()
+    for level, message in definition.issues + issues:
+        print(f"{level}: {message}", file=sys.stderr)
+
+    names = [os.path.basename(path) for path in args.binaries]
+    report = []
+    for comparison in comparisons:
+        per_file = []
+        for index, name in enumerate(names):
+            entry = {"file": name, "changed_cells": int(comparison.changed[index].sum())}
+            if comparison.values.ndim == 1:
+                entry["value"] = float(comparison.values[index])
+            else:
+                entry["max_abs_diff"] = float(np.nanmax(np.abs(comparison.values[index] - comparison.values[0]), initial=0))
+            per_file.append(entry)
+        report.append({
+            "name": comparison.name,
+            "group": comparison.group,
+            "input_type": comparison.input_type,
+            "changed_cells": comparison.changed_cells,
+            "total_cells": comparison.total_cells,
+            "files": per_file,
+        })
+
+    differing = [entry for entry in report if entry["changed_cells"]]
+    print(f"{len(differing)} of {len(report)} parameter(s) differ from {names[0]}.")
+    for entry in differing:
+        print(f"  {entry['group']} / {entry['name']}: {entry['changed_cells']} of {entry['total_cells']} cell(s) changed")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"definition": args.definition, "reference": names[0], "parameters": report}, f, indent=2)
+    return 0
+
+# Function to relocate a definition's offsets from its reference binary to a new software revision
+def run_relocate(args):
+    with open(args.definition, "r", encoding="utf-8") as f:
+        json_data = json.load(f)
+    with BinaryImage.open(args.reference) as reference, BinaryImage.open(args.target) as target:
+        relocated, located = relocate_definition(json_data, reference.buffer, target.buffer)
+    if args.calibration_id:
+        relocated["calibration_id"] = args.calibration_id
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(relocated, f, indent=2, ensure_ascii=False)
+    unresolved = 0
+    for entry in located:
+        new_offset = hex(entry["new_offset"]) if entry["new_offset"] is not None else "-"
+        print(f"  {entry['status']:<10} {entry['name']}: {hex(entry['old_offset'])} -> {new_offset}")
+        unresolved += entry["status"] == "unresolved"
+    inferred = sum(entry["status"] == "inferred" for entry in located)
+    print(f"Relocated {len(located) - unresolved} of {len(located)} region(s) ({inferred} inferred). Definition written to {args.output}.")
+    return 1 if unresolved else 0
+
+# Function to re-apply an archived JSON patch to a binary, checking it was made for that binary
+def run_patch(args):
+    with open(args.patch, "r", encoding="utf-8") as f:
+        patch_json = f.read()
+    source_sha256 = json.loads(patch_json).get("source_sha256")
+    try:
+        with BinaryImage.open(args.input) as image:
+            if source_sha256 and source_sha256 != image.source_sha256():
+                raise ValueError(f"{args.input} is not the binary the patch was made for (SHA-256 {source_sha256}).")
+            patched = apply_patch(image.buffer, patch_json)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    with open(args.output, "wb") as f:
+        f.write(patched)
+    print(f"Patched binary written to {args.output} (SHA-256 {hashlib.sha256(patched).hexdigest()}).")
+    return 0
+
+# Function to lint definition files: compile issues plus overlapping, out-of-bounds and mismatched regions
+def run_validate(args):
+    binary_size = args.binary_size
+    if args.binary:
+        binary_size = os.path.getsize(args.binary)
+    failed = 0
+    for path in args.definitions:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                json_data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"{path}: error: {e}")
+            failed += 1
+            continue
+        issues = compile_definition(json_data).issues + validate_definition(json_data, binary_size)
+        for level, message in issues:
+            print(f"{path}: {level}: {message}")
+        errors = sum(level == "error" for level, _ in issues)
+        failed += errors > 0
+        print(f"{path}: {errors} error(s), {len(issues) - errors} warning(s).")
+    print(f"Validated {len(args.definitions)} definition(s), {failed} with errors.")
+    return 1 if failed else 0
+
+# Function to build the command-line parser
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless tools for the Binary File Editor.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    apply_parser = subparsers.add_parser("apply", help="Apply a tune to every binary in a directory.")
+    apply_parser.add_argument("--definition", required=True, help="JSON definition file.")
+    apply_parser.add_argument("--tune", required=True,
+                              help="JSON file mapping slider, map and control slider names to values.")
+    apply_parser.add_argument("--input-dir", required=True, help="Directory of stock binaries.")
+    apply_parser.add_argument("--output-dir", required=True, help="Directory for modified binaries and report.json.")
+    apply_parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    apply_parser.add_argument("--patches", action="store_true", help="Also write a JSON patch next to each output.")
+    apply_parser.set_defaults(func=run_apply)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare every defined parameter across binaries.")
+    compare_parser.add_argument("--definition", required=True, help="JSON definition file.")
+    compare_parser.add_argument("binaries", nargs="+", help="Binaries to compare; the first is the reference.")
+    compare_parser.add_argument("--output", help="Write the full comparison as JSON.")
+    compare_parser.set_defaults(func=run_compare)
+
+    relocate_parser = subparsers.add_parser("relocate", help="Find a definition's maps in a new software revision.")
+    relocate_parser.add_argument("--definition", required=True, help="JSON definition matching the reference binary.")
+    relocate_parser.add_argument("--reference", required=True, help="Binary the definition's offsets are correct for.")
+    relocate_parser.add_argument("--target", required=True, help="Binary to find the maps in.")
+    relocate_parser.add_argument("--output", required=True, help="Path of the relocated JSON definition.")
+    relocate_parser.add_argument("--calibration-id", help="calibration_id to set in the relocated definition.")
+    relocate_parser.set_defaults(func=run_relocate)
+
+    patch_parser = subparsers.add_parser("patch", help="Re-apply an archived JSON patch to a binary.")
+    patch_parser.add_argument("--patch", required=True, help="JSON patch written by the editor or apply --patches.")
+    patch_parser.add_argument("--input", required=True, help="Binary the patch was made for.")
+    patch_parser.add_argument("--output", required=True, help="Path of the patched binary.")
+    patch_parser.set_defaults(func=run_patch)
+
+    validate_parser = subparsers.add_parser("validate", help="Check definitions for overlapping, out-of-bounds and mismatched regions.")
+    validate_parser.add_argument("definitions", nargs="+", help="JSON definition files.")
+    size_group = validate_parser.add_mutually_exclusive_group()
+    size_group.add_argument("--binary", help="Binary whose size the regions must fit in.")
+    size_group.add_argument("--binary-size", type=lambda value: int(value, 0), help="Image size in bytes, e.g. 0x250000.")
+    validate_parser.set_defaults(func=run_validate)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
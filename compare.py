@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from core import apply_scaling
+
+# Decoded values of one parameter across several binaries, compared with the first (reference) binary
+@dataclass(slots=True)
+class ParameterComparison:
+    name: str
+    group: str
+    input_type: str
+    # (files,) for single values, (files, rows, columns) for tables
+    values: np.ndarray
+    # Cells whose value differs from the reference binary, same shape as values
+    changed: np.ndarray
+
+    @property
+    def changed_cells(self):
+        return int(self.changed.any(axis=0).sum())
+
+    @property
+    def total_cells(self):
+        return int(np.prod(self.values.shape[1:], dtype=np.int64))
+
+# Function to decode the same cells from every binary into one (files, count) array, scaling them in one pass
+def decode_across(binaries, offset, count, dtype, scaling):
+    for index, binary_data in enumerate(binaries):
+        if offset + count * dtype.itemsize > len(binary_data):
+            raise ValueError(f"Offset {hex(offset)} with length {count * dtype.itemsize} exceeds the size of binary {index + 1}.")
+    raw = np.stack([np.frombuffer(binary_data, dtype=dtype, count=count, offset=offset) for binary_data in binaries])
+    values = raw.astype(np.float64)
+    if scaling:
+        values = apply_scaling(values, *scaling)
+    return values
+
+# Function to find the cells that differ from the reference (first) binary; NaNs compare equal
+def find_changes(values):
+    reference = values[:1]
+    return ~((values == reference) | (np.isnan(values) & np.isnan(reference)))
+
+# Function to decode every map, slider and readonly value of a definition from several binaries and compare them
+def compare_binaries(definition, binaries):
+    comparisons = []
+    issues = []
+    sections = [(group.name, group.maps) for group in definition.groups]
+    sections.append(("Editable Maps", definition.editable_maps))
+    for group_name, layouts in sections:
+        for layout in layouts:
+            try:
+                if layout.input_type in ("map_editor", "map_multiplier"):
+                    values = decode_across(binaries, layout.offset, layout.rows * layout.columns, layout.dtype, layout.scaling)
+                    values = values.reshape(len(binaries), layout.rows, layout.columns)
+                elif layout.input_type in ("slider", "readonly") and layout.codec is not None:
+                    values = decode_across(binaries, layout.offset, 1, np.dtype(layout.codec.format), layout.scaling)[:, 0]
+                else:
+                    continue
+            except ValueError as e:
+                issues.append(("error", f"'{layout.name}': {e}"))
+                continue
+            comparisons.append(ParameterComparison(layout.name, group_name, layout.input_type, values, find_changes(values)))
+    return comparisons, issues
@@ -0,0 +1,769 @@
+import json
+import struct
+from dataclasses import dataclass, field
+
+import numpy as np
+
+import profiling
+from checksums import compile_checksum
+
+# NumPy dtypes for each supported data type and sign type (little-endian, like the struct formats)
+NUMPY_DTYPES = {
+    ("int8", "signed"): np.dtype("i1"),
+    ("int8", "unsigned"): np.dtype("u1"),
+    ("int16", "signed"): np.dtype("<i2"),
+    ("int16", "unsigned"): np.dtype("<u2"),
+    ("int32", "signed"): np.dtype("<i4"),
+    ("int32", "unsigned"): np.dtype("<u4"),
+    ("float", "signed"): np.dtype("<f4"),
+    ("float", "unsigned"): np.dtype("<f4"),
+}
+
+# Function to get the NumPy dtype for a data type and sign type
+def get_numpy_dtype(data_type, sign_type):
+    return NUMPY_DTYPES.get((data_type, "signed" if sign_type == "signed" else "unsigned"))
+
+# struct formats for each supported data type and sign type
+STRUCT_FORMATS = {
+    ("int8", "signed"): 'b',
+    ("int8", "unsigned"): 'B',
+    ("int16", "signed"): '<h',
+    ("int16", "unsigned"): '<H',
+    ("int32", "signed"): '<i',
+    ("int32", "unsigned"): '<I',
+    ("float", "signed"): '<f',
+    ("float", "unsigned"): '<f',
+}
+
+# Function to get a precompiled struct for a data type and sign type
+def get_struct(data_type, sign_type):
+    fmt = STRUCT_FORMATS.get((data_type, "signed" if sign_type == "signed" else "unsigned"))
+    return struct.Struct(fmt) if fmt else None
+
+# Function to determine cell data type based on cell length
+def get_cell_data_type(cell_length):
+    if cell_length == 1:
+        return "int8"
+    elif cell_length == 2:
+        return "int16"
+    elif cell_length == 4:
+        return "int32"
+    else:
+        return None  # Unsupported
+
+# Function to turn a scaling block into a (factor, offset) pair, or None when there is no scaling
+def get_scaling(scaling):
+    if not scaling:
+        return None
+    return (scaling.get('factor', 1), scaling.get('offset', 0))
+
+# Function to apply scaling
+def apply_scaling(value, factor, offset):
+    return (value * factor) + offset
+
+# Function to reverse scaling
+def reverse_scaling(value, factor, offset):
+    return (value - offset) / factor
+
+# Function to get the raw cell values scaled values are stored as: scaling reversed, integer cells rounded and float cells
+# rounded to single precision, without clamping so out-of-range edits are kept as entered
+def to_raw_values(values, scaling, integer):
+    raw = np.asarray(values, dtype=np.float64)
+    if scaling:
+        raw = reverse_scaling(raw, *scaling)
+    return np.rint(raw) if integer else raw.astype(np.float32).astype(np.float64)
+
+# Function to get the scaled values of raw cell values
+def from_raw_values(raw, scaling):
+    return apply_scaling(raw, *scaling) if scaling else raw
+
+# Function to build the editable cell mask of a map from its map_dimension
+def build_editable_mask(map_dimension, rows, columns):
+    editable_columns = map_dimension.get("editable_columns", [])
+    editable_region = map_dimension.get("editable_region", {})
+    mask = np.zeros((rows, columns), dtype=bool)
+    invalid_columns = []
+    if editable_columns == "all":
+        mask[:, :] = True
+    elif isinstance(editable_columns, list):
+        for col in editable_columns:
+            if isinstance(col, int) and 0 <= col < columns:
+                mask[:, col] = True
+            else:
+                invalid_columns.append(col)
+    if editable_region:
+        start_row = max(editable_region.get("start_row", 0), 0)
+        end_row = min(editable_region.get("end_row", rows - 1), rows - 1)
+        start_column = max(editable_region.get("start_column", 0), 0)
+        end_column = min(editable_region.get("end_column", columns - 1), columns - 1)
+        mask[start_row:end_row + 1, start_column:end_column + 1] = True
+    return mask, invalid_columns
+
+# Function to decode a whole map from binary data in one pass
+@profiling.instrumented("decode_map")
+def decode_map(binary_data, offset, rows, columns, dtype, scaling):
+    count = rows * columns
+    if offset < 0 or offset + count * dtype.itemsize > len(binary_data):
+        raise ValueError(f"Map at {hex(offset)} with {count} cells of {dtype.itemsize} bytes exceeds binary file size.")
+    raw = np.frombuffer(binary_data, dtype=dtype, count=count, offset=offset).reshape(rows, columns)
+    values = raw.astype(np.float64)
+    # Apply scaling to every cell at once
+    if scaling:
+        values = apply_scaling(values, *scaling)
+    return values
+
+# Function to find, for each point, the surrounding breakpoint indices and interpolation weight along one axis
+# Points outside the axis are clamped to its ends; descending axes are supported
+def axis_weights(axis, points):
+    axis = np.asarray(axis, dtype=np.float64)
+    points = np.asarray(points, dtype=np.float64)
+    if axis.size == 1:
+        zeros = np.zeros(points.shape, dtype=np.intp)
+        return zeros, zeros, np.zeros(points.shape)
+    descending = axis[0] > axis[-1]
+    if descending:
+        axis = axis[::-1]
+    points = np.clip(points, axis[0], axis[-1])
+    lower = np.clip(np.searchsorted(axis, points, side="right") - 1, 0, axis.size - 2)
+    span = axis[lower + 1] - axis[lower]
+    weight = np.divide(points - axis[lower], span, out=np.zeros(points.shape), where=span != 0)
+    if descending:
+        lower = axis.size - 2 - lower
+        weight = 1 - weight
+    return lower, lower + 1, weight
+
+# Function to resample a whole map onto new breakpoints with bilinear interpolation in one pass
+# values is indexed [row, column]; rows follow the y axis and columns follow the x axis
+def bilinear_resample(values, x_axis, y_axis, new_x, new_y):
+    values = np.asarray(values, dtype=np.float64)
+    x_lower, x_upper, x_weight = axis_weights(x_axis, new_x)
+    y_lower, y_upper, y_weight = axis_weights(y_axis, new_y)
+    top = values[np.ix_(y_lower, x_lower)] * (1 - x_weight) + values[np.ix_(y_lower, x_upper)] * x_weight
+    bottom = values[np.ix_(y_upper, x_lower)] * (1 - x_weight) + values[np.ix_(y_upper, x_upper)] * x_weight
+    return top * (1 - y_weight)[:, None] + bottom * y_weight[:, None]
+
+# Function to smooth the masked cells of a map with a 3x3 mean of their neighbours
+def smooth_region(values, mask):
+    values = np.asarray(values, dtype=np.float64)
+    rows, columns = values.shape
+    padded = np.pad(values, 1, mode="edge")
+    total = sum(padded[r:r + rows, c:c + columns] for r in range(3) for c in range(3))
+    return np.where(mask, total / 9, values)
+
+# Function to scale and offset the masked cells of a map
+def scale_region(values, mask, factor, offset=0.0):
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(mask, values * factor + offset, values)
+
+# Function to turn bytes written at an offset into a pending write of (byte offsets, byte values)
+def byte_write(offset, data):
+    return np.arange(offset, offset + len(data)), np.frombuffer(data, dtype=np.uint8)
+
+# Function to find the bytes that differ between the original and edited copies of a region, as one pending write
+def diff_region(offset, old, new):
+    new = np.frombuffer(new, dtype=np.uint8)
+    changed = np.flatnonzero(np.frombuffer(old, dtype=np.uint8) != new)
+    return offset + changed, new[changed]
+
+# Changed bytes of an edited image: their offsets in ascending order with the original and the new values
+@dataclass(slots=True)
+class Patch:
+    positions: np.ndarray
+    old: np.ndarray
+    new: np.ndarray
+
+    @property
+    def changed_bytes(self):
+        return int(self.positions.size)
+
+    # Number of contiguous runs of changed bytes
+    @property
+    def regions(self):
+        return int(np.count_nonzero(np.diff(self.positions) > 1)) + 1 if self.positions.size else 0
+
+    # Function to get the index range of the changed bytes inside [start, end)
+    def span(self, start, end):
+        first, last = np.searchsorted(self.positions, (start, end))
+        return int(first), int(last)
+
+    # Function to overwrite a copy of the original bytes [start, end) with the changed bytes inside it
+    def apply_to(self, data, start=0):
+        first, last = self.span(start, start + len(data))
+        np.frombuffer(data, dtype=np.uint8)[self.positions[first:last] - start] = self.new[first:last]
+
+    # Function to list the patch as (offset, old bytes, new bytes) runs
+    def runs(self):
+        if not self.positions.size:
+            return []
+        breaks = np.flatnonzero(np.diff(self.positions) > 1) + 1
+        firsts = np.concatenate(([0], breaks)).tolist()
+        lasts = np.concatenate((breaks, [self.positions.size])).tolist()
+        old = self.old.tobytes()
+        new = self.new.tobytes()
+        return [(offset, old[first:last], new[first:last]) for offset, first, last in zip(self.positions[firsts].tolist(), firsts, lasts)]
+
+# Function to merge pending writes into a patch against the original binary
+def build_patch(binary_data, writes):
+    if not writes:
+        return Patch(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.uint8))
+    positions = np.concatenate([positions for positions, _ in writes]).astype(np.int64, copy=False)
+    values = np.concatenate([values for _, values in writes])
+    # Later writes win where writes overlap: keep the last value written to each offset
+    positions, last = np.unique(positions[::-1], return_index=True)
+    values = values[::-1][last]
+    original = np.frombuffer(binary_data, dtype=np.uint8)[positions]
+    changed = original != values
+    return Patch(positions[changed], original[changed], values[changed])
+
+# Size of the chunks the patched binary is streamed in
+CHUNK_SIZE = 1 << 20
+
+# Function to iterate over the patched binary in chunks: zero-copy views of the original where nothing changed
+def iter_patched_chunks(binary_data, patch):
+    view = memoryview(binary_data)
+    for start in range(0, len(view), CHUNK_SIZE):
+        chunk = view[start:start + CHUNK_SIZE]
+        first, last = patch.span(start, start + len(chunk))
+        if first == last:
+            yield chunk
+        else:
+            chunk = bytearray(chunk)
+            patch.apply_to(chunk, start)
+            yield chunk
+
+# Function to build the patched binary as a new bytearray: one copy of the original with the changed bytes scattered in one pass.
+# It is not copied again into bytes, which would cost as much as the whole build.
+def build_patched_binary(binary_data, patch):
+    data = bytearray(binary_data)
+    np.frombuffer(data, dtype=np.uint8)[patch.positions] = patch.new
+    return data
+
+# Function to serialize a patch as JSON offset/old/new records
+def patch_to_json(patch, calibration_id=None, source_sha256=None, source_size=None):
+    return json.dumps({
+        "calibration_id": calibration_id,
+        "source_sha256": source_sha256,
+        "source_size": source_size,
+        "records": [{"offset": hex(offset), "old": old.hex(), "new": new.hex()} for offset, old, new in patch.runs()],
+    }, indent=2)
+
+# Function to re-apply a JSON patch to a binary, checking that the original bytes match
+def apply_patch(binary_data, patch_json):
+    patch_data = json.loads(patch_json)
+    source_size = patch_data.get("source_size")
+    if source_size is not None and source_size != len(binary_data):
+        raise ValueError(f"The patch was made for a binary of {source_size} bytes, not {len(binary_data)}.")
+    writes = []
+    for record in patch_data.get("records", []):
+        offset = int(record["offset"], 16)
+        old = bytes.fromhex(record["old"])
+        new = bytes.fromhex(record["new"])
+        if len(old) != len(new):
+            raise ValueError(f"Patch record at {record['offset']} has mismatched old/new lengths.")
+        if offset < 0 or binary_data[offset:offset + len(old)] != old:
+            raise ValueError(f"Binary does not match the patch's original bytes at {record['offset']}.")
+        writes.append(byte_write(offset, new))
+    return build_patched_binary(binary_data, build_patch(binary_data, writes))
+
+# Compiled layout of a single value (slider or readonly)
+@dataclass(slots=True)
+class ScalarLayout:
+    name: str
+    description: str
+    input_type: str
+    data_type: str
+    offset: int
+    length: int
+    codec: struct.Struct | None
+    scaling: tuple | None
+    min_value: float | None = None
+    max_value: float | None = None
+    step: float | None = None
+    default_value: float | None = None
+
+# Compiled layout of a map axis (breakpoints stored as consecutive cells)
+@dataclass(slots=True)
+class AxisLayout:
+    name: str
+    offset: int
+    count: int
+    dtype: np.dtype
+    scaling: tuple | None
+
+    @property
+    def length(self):
+        return self.count * self.dtype.itemsize
+
+# Function to get the key of an axis's edited breakpoints in the edited values; maps sharing an axis share the key
+def axis_key(axis):
+    return f"axis:{hex(axis.offset)}"
+
+# Function to round breakpoints to the values the axis can store, raising ValueError if they do not fit its data type
+def quantize_breakpoints(axis, breakpoints):
+    raw = np.asarray(breakpoints, dtype=np.float64)
+    if axis.scaling:
+        raw = reverse_scaling(raw, *axis.scaling)
+    if axis.dtype.kind in "iu":
+        raw = np.rint(raw)
+        info = np.iinfo(axis.dtype)
+        if ((raw < info.min) | (raw > info.max)).any():
+            raise ValueError(f"Breakpoints of axis '{axis.name}' are outside the range {info.min}..{info.max} of {axis.dtype.name}.")
+    stored = raw.astype(axis.dtype).astype(np.float64)
+    return apply_scaling(stored, *axis.scaling) if axis.scaling else stored
+
+# Compiled layout of a map_editor table, or of the cells a map_multiplier scales
+@dataclass(slots=True)
+class TableLayout:
+    name: str
+    description: str
+    data_type: str
+    offset: int
+    rows: int
+    columns: int
+    dtype: np.dtype
+    scaling: tuple | None
+    editable_mask: np.ndarray
+    codec: struct.Struct | None = None
+    input_type: str = "map_editor"
+    x_axis: AxisLayout | None = None
+    y_axis: AxisLayout | None = None
+
+    @property
+    def length(self):
+        return self.rows * self.columns * self.dtype.itemsize
+
+# Function to get a one-row table layout over an axis's breakpoints, so edited breakpoints are encoded like a map
+def axis_table(axis):
+    editable_mask = np.ones((1, axis.count), dtype=bool)
+    editable_mask.setflags(write=False)
+    return TableLayout(axis.name or axis_key(axis), "", axis.dtype.name, axis.offset, 1, axis.count, axis.dtype, axis.scaling, editable_mask)
+
+# Compiled layout of a group's control slider
+@dataclass(slots=True)
+class ControlSliderLayout:
+    name: str
+    description: str
+    min_value: float
+    max_value: float
+    step: float
+    default_value: float
+
+# Compiled layout of a map group
+@dataclass(slots=True)
+class GroupLayout:
+    name: str
+    maps: list
+    control_slider: ControlSliderLayout | None = None
+
+# Compiled layout of a whole definition, with every validation issue found while compiling
+@dataclass(slots=True)
+class DefinitionLayout:
+    calibration_id: str | None
+    groups: list
+    editable_maps: list
+    issues: list = field(default_factory=list)
+    checksums: list = field(default_factory=list)
+
+# Function to check that a slider's min/max/step are present and consistent
+def validate_slider(kind, name, min_val, max_val, step, issues):
+    if min_val is None or max_val is None or step is None:
+        issues.append(("error", f"{kind} '{name}' is missing 'min_value', 'max_value', or 'step'. Skipping."))
+        return False
+    if not isinstance(min_val, (int, float)) or not isinstance(max_val, (int, float)) or not isinstance(step, (int, float)):
+        issues.append(("error", f"{kind} '{name}' has invalid 'min_value', 'max_value', or 'step' types. Skipping."))
+        return False
+    if min_val > max_val:
+        issues.append(("error", f"{kind} '{name}' has 'min_value' greater than 'max_value'. Skipping."))
+        return False
+    return True
+
+# Function to compile an x_axis/y_axis block with one breakpoint per column/row, or None if it cannot be used
+def compile_axis(axis, count, axis_name, map_name, issues):
+    if not axis:
+        return None
+    if not isinstance(axis, dict):
+        issues.append(("warning", f"The axis of map '{map_name}' is not an object. Axis ignored."))
+        return None
+    try:
+        offset = int(axis.get("start_offset"), 16)
+    except (TypeError, ValueError):
+        issues.append(("warning", f"Invalid start_offset '{axis.get('start_offset')}' for the axis of map '{map_name}'. Axis ignored."))
+        return None
+    if offset < 0:
+        issues.append(("warning", f"Negative start_offset '{axis.get('start_offset')}' for the axis of map '{map_name}'. Axis ignored."))
+        return None
+    dtype = get_numpy_dtype(axis.get("data_type"), axis.get("sign_type", "unsigned"))
+    if dtype is None:
+        issues.append(("warning", f"Unsupported axis data type '{axis.get('data_type')}' in map '{map_name}'. Axis ignored."))
+        return None
+    # length is either the size of one breakpoint or of the whole axis
+    length = axis.get("length", dtype.itemsize)
+    if length not in (dtype.itemsize, count * dtype.itemsize):
+        issues.append(("warning", f"Axis length {length} in map '{map_name}' does not match {count} breakpoints of {dtype.itemsize} bytes. Axis ignored."))
+        return None
+    return AxisLayout(axis_name, offset, count, dtype, get_scaling(axis.get("scaling", {})))
+
+# Function to compile one map entry of the definition, or None if it cannot be used
+def compile_map(item, issues):
+    name = item.get("name")
+    description = item.get("description", "")
+    input_type = item.get("input_type")
+    data_type = item.get("data_type")
+    sign_type = item.get("sign_type", "unsigned")
+    scaling = get_scaling(item.get("scaling", {}))
+    length = item.get("length")
+
+    if input_type not in ("slider", "readonly", "map_multiplier", "map_editor"):
+        issues.append(("warning", f"Unsupported input type: {input_type}"))
+        return None
+
+    try:
+        offset = int(item.get("offset"), 16)
+    except (TypeError, ValueError):
+        issues.append(("error", f"Invalid offset format: {item.get('offset')}"))
+        return None
+    if offset < 0:
+        issues.append(("error", f"'{name}' has negative offset {item.get('offset')}. Skipping."))
+        return None
+    if not isinstance(length, int) or isinstance(length, bool) or length <= 0:
+        issues.append(("error", f"'{name}' has invalid length '{length}'. Skipping."))
+        return None
+
+    if input_type == "map_multiplier" and data_type != "array":
+        # A single value scaled by the control slider, compiled as a 1x1 table
+        dtype = get_numpy_dtype(data_type, sign_type)
+        if dtype is None:
+            issues.append(("error", f"Unsupported data type: {data_type} in '{name}'. Skipping."))
+            return None
+        if length != dtype.itemsize:
+            issues.append(("error", f"'{name}' has length {length} but data type {data_type} uses {dtype.itemsize} bytes. Skipping."))
+            return None
+        editable_mask = np.ones((1, 1), dtype=bool)
+        editable_mask.setflags(write=False)
+        return TableLayout(name, description, data_type, offset, 1, 1, dtype, scaling, editable_mask,
+                           codec=get_struct(data_type, sign_type), input_type=input_type)
+
+    if input_type in ("map_editor", "map_multiplier"):
+        map_dimension = item.get("map_dimension", {})
+        if not isinstance(map_dimension, dict):
+            issues.append(("error", f"Map '{name}' has an invalid map_dimension. Skipping."))
+            return None
+        rows = map_dimension.get("rows", 0)
+        columns = map_dimension.get("columns", 0)
+        if not isinstance(rows, int) or not isinstance(columns, int) or isinstance(rows, bool) or isinstance(columns, bool):
+            issues.append(("error", f"Map '{name}' has non-integer rows or columns. Skipping."))
+            return None
+        if rows <= 0 or columns <= 0:
+            issues.append(("warning", f"Map '{name}' has invalid rows or columns."))
+            return None
+        # Calculate cell_length and cell_data_type
+        cell_length = length // (rows * columns)
+        cell_data_type = get_cell_data_type(cell_length)
+        if cell_data_type is None:
+            issues.append(("error", f"Unsupported cell length {cell_length} in map '{name}'. Skipping."))
+            return None
+        if input_type == "map_multiplier":
+            # The control slider scales every cell of the map
+            editable_mask = np.ones((rows, columns), dtype=bool)
+        else:
+            region = map_dimension.get("editable_region")
+            if region and (not isinstance(region, dict) or not all(isinstance(value, int) for value in region.values())):
+                issues.append(("error", f"Map '{name}' has an invalid editable_region. Skipping."))
+                return None
+            # Determine which cells are editable
+            editable_mask, invalid_columns = build_editable_mask(map_dimension, rows, columns)
+            for col in invalid_columns:
+                issues.append(("warning", f"Invalid column index '{col}' in map '{name}'. Skipping column editing for this index."))
+            if not editable_mask.any():
+                issues.append(("warning", f"No editable columns or regions specified for map '{name}'. All cells set to read-only."))
+        editable_mask.setflags(write=False)
+        return TableLayout(
+            name=name,
+            description=description,
+            data_type=data_type,
+            offset=offset,
+            rows=rows,
+            columns=columns,
+            dtype=get_numpy_dtype(cell_data_type, sign_type),
+            scaling=scaling,
+            editable_mask=editable_mask,
+            codec=get_struct(data_type, sign_type),
+            input_type=input_type,
+            x_axis=compile_axis(item.get("x_axis"), columns, map_dimension.get("x_axis_name", ""), name, issues),
+            y_axis=compile_axis(item.get("y_axis"), rows, map_dimension.get("y_axis_name", ""), name, issues),
+        )
+
+    codec = get_struct(data_type, sign_type)
+    if codec is None:
+        issues.append(("error", f"Unsupported data type: {data_type} in '{name}'. Skipping."))
+        return None
+    if length != codec.size:
+        issues.append(("error", f"'{name}' has length {length} but data type {data_type} uses {codec.size} bytes. Skipping."))
+        return None
+
+    min_val = item.get("min_value")
+    max_val = item.get("max_value")
+    step = item.get("step", 1)
+    if input_type == "slider" and not validate_slider("Slider", name, min_val, max_val, step, issues):
+        return None
+    return ScalarLayout(name, description, input_type, data_type, offset, length, codec, scaling,
+                        min_val, max_val, step, item.get("default_value"))
+
+# Function to compile a JSON definition into typed layouts, running all validation once
+def compile_definition(json_data):
+    issues = []
+    groups = []
+    for group in json_data.get("map_groups", []):
+        maps = [layout for layout in (compile_map(item, issues) for item in group.get("maps", [])) if layout is not None]
+        control_slider = group.get("control_slider")
+        cs_layout = None
+        if control_slider:
+            cs_name = control_slider.get("name")
+            cs_min = control_slider.get("min_value")
+            cs_max = control_slider.get("max_value")
+            cs_step = control_slider.get("step", 0.1)
+            if validate_slider("Control slider", cs_name, cs_min, cs_max, cs_step, issues):
+                cs_layout = ControlSliderLayout(cs_name, control_slider.get("description", ""), cs_min, cs_max, cs_step,
+                                                control_slider.get("default_value", 1.0))
+        groups.append(GroupLayout(group.get("group_name", "Unnamed Group"), maps, cs_layout))
+    editable_maps = [layout for layout in (compile_map(item, issues) for item in json_data.get("editable_maps", [])) if layout is not None]
+    checksums = [layout for layout in (compile_checksum(item, issues) for item in json_data.get("checksums", [])) if layout is not None]
+    return DefinitionLayout(json_data.get("calibration_id"), groups, editable_maps, issues, checksums)
+
+# Function to iterate over every map entry of a raw JSON definition, groups first
+def iter_items(json_data):
+    for group in json_data.get("map_groups", []):
+        yield from group.get("maps", [])
+    yield from json_data.get("editable_maps", [])
+
+# Function to iterate over every byte region a raw JSON definition points at:
+# (label, entry dict, offset key, offset, length) for map/slider offsets and axis start offsets
+def iter_regions(json_data):
+    for item in iter_items(json_data):
+        name = item.get("name")
+        try:
+            length = item.get("length")
+            yield name, item, "offset", int(item.get("offset"), 16), length if isinstance(length, int) else 0
+        except (TypeError, ValueError):
+            pass
+        map_dimension = item.get("map_dimension", {})
+        if not isinstance(map_dimension, dict):
+            continue
+        for axis_key, count in (("x_axis", map_dimension.get("columns", 0)), ("y_axis", map_dimension.get("rows", 0))):
+            axis = item.get(axis_key)
+            if not isinstance(axis, dict) or not isinstance(count, int):
+                continue
+            dtype = get_numpy_dtype(axis.get("data_type"), axis.get("sign_type", "unsigned"))
+            try:
+                offset = int(axis.get("start_offset"), 16)
+            except (TypeError, ValueError):
+                continue
+            itemsize = dtype.itemsize if dtype is not None else axis.get("length", 0)
+            if not isinstance(itemsize, int):
+                continue
+            yield f"{name} {axis_key}", axis, "start_offset", offset, max(count, 1) * itemsize
+
+# Function to iterate over every compiled layout of a definition, groups first
+def iter_layouts(definition):
+    for group in definition.groups:
+        yield from group.maps
+    yield from definition.editable_maps
+
+# Function to load and compile a definition file
+def load_definition_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return compile_definition(json.load(f))
+
+# Function to read a value from binary data
+@profiling.instrumented("read_from_binary")
+def read_from_binary(binary_data, offset, codec, scaling):
+    if offset < 0 or offset + codec.size > len(binary_data):
+        raise ValueError(f"Offset {hex(offset)} with length {codec.size} exceeds binary file size.")
+    value = codec.unpack_from(binary_data, offset)[0]
+    profiling.record("struct_unpack")
+    # Apply scaling if necessary
+    if scaling:
+        value = apply_scaling(value, *scaling)
+    return value
+
+# Function to write a value to binary data; only values whose bytes change are added to the pending writes
+@profiling.instrumented("write_to_binary")
+def write_to_binary(binary_data, writes, offset, codec, value, scaling):
+    if offset < 0 or offset + codec.size > len(binary_data):
+        raise ValueError(f"Offset {hex(offset)} with length {codec.size} exceeds binary file size.")
+    # Reverse scaling if necessary
+    if scaling:
+        value = reverse_scaling(value, *scaling)
+    # Integer cells take the nearest raw value
+    if not codec.format.endswith('f'):
+        value = round(value)
+    try:
+        packed_data = codec.pack(value)
+    except struct.error as e:
+        raise ValueError(f"Error packing data: {e}") from e
+    profiling.record("struct_pack")
+    if packed_data != binary_data[offset:offset + codec.size]:
+        writes.append(byte_write(offset, packed_data))
+
+# Function to encode the edited tables of several map editors, given as (layout, table) pairs, in one pass per cell type.
+# Empty (NaN) and read-only cells are left untouched; a map with cells outside its cell type's range is not written at all.
+# Only the changed bytes are added to the pending writes.
+@profiling.instrumented("encode_map")
+def write_maps(binary_data, writes, tables, issues):
+    by_dtype = {}
+    for layout, table in tables:
+        if layout.offset < 0 or layout.offset + layout.length > len(binary_data):
+            issues.append(("error", f"Offset {hex(layout.offset)} with length {layout.length} exceeds binary file size."))
+            continue
+        if table.shape[0] < layout.rows or table.shape[1] < layout.columns:
+            issues.append(("error", f"Error writing map '{layout.name}': Edited map has shape {table.shape}, expected ({layout.rows}, {layout.columns})."))
+            continue
+        by_dtype.setdefault(layout.dtype, []).append((layout, table[:layout.rows, :layout.columns]))
+    for dtype, items in by_dtype.items():
+        counts = np.array([layout.rows * layout.columns for layout, _ in items])
+        raw = np.concatenate([np.frombuffer(binary_data, dtype=dtype, count=count, offset=layout.offset)
+                              for (layout, _), count in zip(items, counts.tolist())])
+        edited = np.concatenate([table.ravel() for _, table in items])
+        write_mask = np.concatenate([layout.editable_mask.ravel() for layout, _ in items]) & ~np.isnan(edited)
+        # Reverse every map's scaling at once; maps without scaling keep their values
+        scalings = np.array([layout.scaling or (1, 0) for layout, _ in items], dtype=np.float64).reshape(-1, 2)
+        edited = reverse_scaling(edited, np.repeat(scalings[:, 0], counts), np.repeat(scalings[:, 1], counts))
+        if dtype.kind in "iu":
+            edited = np.rint(edited)
+            info = np.iinfo(dtype)
+            out_of_range = write_mask & ((edited < info.min) | (edited > info.max))
+            rejected = np.add.reduceat(out_of_range.astype(np.int64), np.cumsum(counts) - counts)
+            for (layout, _), cells in zip(items, rejected.tolist()):
+                if cells:
+                    issues.append(("error", f"Error writing map '{layout.name}': {cells} cell(s) are outside the range {info.min}..{info.max} of {dtype.name}."))
+            write_mask &= np.repeat(rejected == 0, counts)
+        new_raw = np.where(write_mask, edited, raw).astype(dtype)
+        changed = np.flatnonzero(raw.view(np.uint8) != new_raw.view(np.uint8))
+        # Offset in the binary of every byte of the concatenated maps
+        byte_counts = counts * dtype.itemsize
+        offsets = np.array([layout.offset for layout, _ in items])
+        positions = np.arange(byte_counts.sum()) + np.repeat(offsets - (np.cumsum(byte_counts) - byte_counts), byte_counts)
+        writes.append((positions[changed], new_raw.view(np.uint8)[changed]))
+
+# Function to multiply the raw cells of several maps, each by its own multiplier, in one pass per cell type,
+# clamped to the cell type's range. Multiplying raw cells is what multiplying the maps' scaling factor used to display.
+# Returns (old raw, new raw, clamped cells) per map.
+def multiply_maps(binary_data, layouts, multipliers):
+    for layout in layouts:
+        if layout.offset < 0 or layout.offset + layout.length > len(binary_data):
+            raise ValueError(f"Map '{layout.name}' at {hex(layout.offset)} with length {layout.length} exceeds binary file size.")
+    results = [None] * len(layouts)
+    by_dtype = {}
+    for index, layout in enumerate(layouts):
+        by_dtype.setdefault(layout.dtype, []).append(index)
+    for dtype, indices in by_dtype.items():
+        counts = [layouts[index].rows * layouts[index].columns for index in indices]
+        raw = np.concatenate([np.frombuffer(binary_data, dtype=dtype, count=count, offset=layouts[index].offset)
+                              for index, count in zip(indices, counts)])
+        scaled = raw.astype(np.float64) * np.repeat([multipliers[index] for index in indices], counts)
+        info = np.iinfo(dtype) if dtype.kind in "iu" else np.finfo(dtype)
+        if dtype.kind in "iu":
+            scaled = np.rint(scaled)
+        clamped = (scaled < info.min) | (scaled > info.max)
+        new_raw = np.clip(scaled, info.min, info.max).astype(dtype)
+        splits = np.cumsum(counts)[:-1]
+        for index, old, new, clamped_cells in zip(indices, np.split(raw, splits), np.split(new_raw, splits), np.split(clamped, splits)):
+            shape = (layouts[index].rows, layouts[index].columns)
+            results[index] = (old.reshape(shape), new.reshape(shape), int(clamped_cells.sum()))
+    return results
+
+# Function to scale map_multiplier maps by their group's control slider value, given as (layout, multiplier) pairs.
+# All maps are scaled in one pass; the definition itself is never changed.
+def write_multipliers(binary_data, writes, multiplied, issues):
+    layouts = []
+    multipliers = []
+    for layout, multiplier in multiplied:
+        if layout.offset < 0 or layout.offset + layout.length > len(binary_data):
+            issues.append(("error", f"Map '{layout.name}' at {hex(layout.offset)} with length {layout.length} exceeds binary file size."))
+            continue
+        layouts.append(layout)
+        multipliers.append(multiplier)
+    for layout, (old, new, clamped) in zip(layouts, multiply_maps(binary_data, layouts, multipliers)):
+        if clamped:
+            issues.append(("warning", f"{clamped} cell(s) of map '{layout.name}' were clamped to the range of {layout.dtype.name}."))
+        writes.append(diff_region(layout.offset, old, new))
+
+# Function to write the edited value of a slider, or queue the edited table of a map editor for write_maps, if one was given
+def write_layout(binary_data, writes, tables, layout, values):
+    if layout.name not in values:
+        return
+    if layout.input_type == "slider":
+        write_to_binary(binary_data, writes, layout.offset, layout.codec, values[layout.name], layout.scaling)
+    elif layout.input_type == "map_editor" and layout.editable_mask.any():
+        # Tables may come from a DataFrame or nested lists; None cells are left untouched
+        tables.append((layout, np.array(values[layout.name], dtype=np.float64, ndmin=2)))
+
+# Function to check edited values from outside the editor, such as a tune file, against a definition:
+# every name must be a slider, map editor or control slider, sliders must be numbers inside their range
+# and tables must have the map's rows and columns of numbers or None (left untouched). Returns error issues.
+def check_values(definition, values):
+    issues = []
+    if not isinstance(values, dict):
+        return [("error", "Edited values must be an object mapping names to values.")]
+    editable = {layout.name: layout for layout in iter_layouts(definition) if layout.input_type in ("slider", "map_editor")}
+    editable.update((group.control_slider.name, group.control_slider) for group in definition.groups if group.control_slider)
+    for name, value in values.items():
+        layout = editable.get(name)
+        if layout is None:
+            issues.append(("error", f"'{name}' is not a slider, map editor or control slider of the definition."))
+        elif isinstance(layout, TableLayout):
+            rows = value if isinstance(value, list) else []
+            if len(rows) != layout.rows or not all(isinstance(row, list) and len(row) == layout.columns for row in rows):
+                issues.append(("error", f"Map '{name}' must be {layout.rows} rows of {layout.columns} values."))
+            elif not all(cell is None or (isinstance(cell, (int, float)) and not isinstance(cell, bool)) for row in rows for cell in row):
+                issues.append(("error", f"Map '{name}' has cells that are neither numbers nor null."))
+        elif not isinstance(value, (int, float)) or isinstance(value, bool):
+            issues.append(("error", f"'{name}' must be a number, not {value!r}."))
+        elif not layout.min_value <= value <= layout.max_value:
+            issues.append(("error", f"'{name}' is {value}, outside its range {layout.min_value}..{layout.max_value}."))
+    return issues
+
+# Function to turn edited values (sliders, map tables and control slider multipliers keyed by name, axis breakpoints keyed by axis_key)
+# into pending writes against the original binary; values that are absent are left untouched
+def collect_writes(binary_data, definition, values):
+    writes = []
+    issues = []
+    tables = []
+    multiplied = []
+    for group in definition.groups:
+        for layout in group.maps:
+            try:
+                with profiling.scope(group.name, layout.name):
+                    write_layout(binary_data, writes, tables, layout, values)
+            except ValueError as e:
+                issues.append(("error", str(e)))
+        # Control sliders scale their group's map_multiplier maps; every group is scaled in one pass below
+        control_slider = group.control_slider
+        if control_slider and control_slider.name in values:
+            multiplied += [(layout, values[control_slider.name]) for layout in group.maps if layout.input_type == "map_multiplier"]
+    # The map editors of every group are encoded in one pass
+    with profiling.scope("", "map editors"):
+        write_maps(binary_data, writes, tables, issues)
+    if multiplied:
+        try:
+            with profiling.scope("", "control sliders"):
+                write_multipliers(binary_data, writes, multiplied, issues)
+        except ValueError as e:
+            issues.append(("error", str(e)))
+    tables = []
+    for layout in definition.editable_maps:
+        try:
+            with profiling.scope("Editable Maps", layout.name):
+                write_layout(binary_data, writes, tables, layout, values)
+        except ValueError as e:
+            issues.append(("error", str(e)))
+    # Edited axis breakpoints, keyed by axis_key, are written once per axis even when maps share it
+    axes = {}
+    for layout in iter_layouts(definition):
+        for axis in (getattr(layout, "x_axis", None), getattr(layout, "y_axis", None)):
+            if axis is not None and axis_key(axis) in values:
+                axes[axis_key(axis)] = axis
+    tables += [(axis_table(axis), np.array(values[key], dtype=np.float64, ndmin=2)) for key, axis in axes.items()]
+    with profiling.scope("Editable Maps", "map editors"):
+        write_maps(binary_data, writes, tables, issues)
+    return writes, issues
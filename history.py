@@ -0,0 +1,137 @@
+from array import array
+
+import numpy as np
+
+# An undo/redo journal that stores each edit step as compact deltas: (value name, flat cell index, old raw value, new raw value).
+# Deltas live in flat typed arrays shared by all steps, so a step costs 24 bytes per changed cell.
+# The journal keeps at most max_steps steps and max_deltas deltas, evicting the oldest steps first.
+class EditJournal:
+    __slots__ = ("max_steps", "max_deltas", "names", "_name_ids", "_keys", "_cells", "_old", "_new",
+                 "_step_starts", "_position", "_evicted", "_pending")
+
+    def __init__(self, max_steps=200, max_deltas=1_000_000):
+        self.max_steps = max_steps
+        self.max_deltas = max_deltas
+        self.names = []
+        self._name_ids = {}
+        self._keys = array("i")
+        self._cells = array("i")
+        self._old = array("d")
+        self._new = array("d")
+        # Index of the first delta of each step
+        self._step_starts = array("q")
+        # Number of steps currently applied
+        self._position = 0
+        # Number of steps evicted from the start of the journal
+        self._evicted = 0
+        self._pending = []
+
+    # Current revision; revision 0 is the state before the first recorded step
+    @property
+    def revision(self):
+        return self._evicted + self._position
+
+    # Oldest revision that can still be reached
+    @property
+    def first_revision(self):
+        return self._evicted
+
+    # Newest revision that can be reached with redo
+    @property
+    def last_revision(self):
+        return self._evicted + len(self._step_starts)
+
+    @property
+    def can_undo(self):
+        return self._position > 0
+
+    @property
+    def can_redo(self):
+        return self._position < len(self._step_starts)
+
+    # Memory used by the recorded deltas
+    @property
+    def nbytes(self):
+        return sum(len(column) * column.itemsize for column in (self._keys, self._cells, self._old, self._new, self._step_starts))
+
+    # Function to stage the changed cells of one value for the next step
+    def stage(self, name, cells, old, new):
+        cells = np.asarray(cells, dtype=np.int32).ravel()
+        if cells.size:
+            self._pending.append((name, cells, np.asarray(old, dtype=np.float64).ravel(), np.asarray(new, dtype=np.float64).ravel()))
+
+    # Function to record the staged changes as one step; redo history past the current revision is dropped
+    def commit(self):
+        if not self._pending:
+            return False
+        pending, self._pending = self._pending, []
+        self._truncate(self._position)
+        self._step_starts.append(len(self._cells))
+        for name, cells, old, new in pending:
+            if name not in self._name_ids:
+                self._name_ids[name] = len(self.names)
+                self.names.append(name)
+            self._keys.extend(array("i", [self._name_ids[name]]) * cells.size)
+            self._cells.frombytes(cells.tobytes())
+            self._old.frombytes(old.tobytes())
+            self._new.frombytes(new.tobytes())
+        self._position = len(self._step_starts)
+        while len(self._step_starts) > 1 and (len(self._step_starts) > self.max_steps or len(self._cells) > self.max_deltas):
+            self._evict_oldest()
+        return True
+
+    # Function to drop the steps from the given step onwards
+    def _truncate(self, step):
+        if step >= len(self._step_starts):
+            return
+        cut = self._step_starts[step]
+        for column in (self._keys, self._cells, self._old, self._new):
+            del column[cut:]
+        del self._step_starts[step:]
+
+    # Function to drop the oldest step
+    def _evict_oldest(self):
+        cut = self._step_starts[1]
+        for column in (self._keys, self._cells, self._old, self._new):
+            del column[:cut]
+        self._step_starts = array("q", (start - cut for start in self._step_starts[1:]))
+        self._evicted += 1
+        self._position = max(self._position - 1, 0)
+
+    # Function to get the deltas of one step grouped by value: [(name, cells, old values, new values)]
+    def _step_changes(self, step):
+        start = self._step_starts[step]
+        end = self._step_starts[step + 1] if step + 1 < len(self._step_starts) else len(self._cells)
+        keys = np.frombuffer(self._keys, dtype=np.int32)[start:end]
+        cells = np.frombuffer(self._cells, dtype=np.int32)[start:end]
+        old = np.frombuffer(self._old, dtype=np.float64)[start:end]
+        new = np.frombuffer(self._new, dtype=np.float64)[start:end]
+        changes = []
+        for key in np.unique(keys):
+            selected = keys == key
+            changes.append((self.names[key], cells[selected].copy(), old[selected].copy(), new[selected].copy()))
+        return changes
+
+    # Function to step back one revision; returns [(name, cells, values)] to apply
+    def undo(self):
+        if not self.can_undo:
+            return []
+        self._position -= 1
+        return [(name, cells, old) for name, cells, old, _ in self._step_changes(self._position)]
+
+    # Function to step forward one revision; returns [(name, cells, values)] to apply
+    def redo(self):
+        if not self.can_redo:
+            return []
+        self._position += 1
+        return [(name, cells, new) for name, cells, _, new in self._step_changes(self._position - 1)]
+
+    # Function to move to any reachable revision; returns the changes to apply, in order
+    def jump(self, revision):
+        revision = min(max(revision, self.first_revision), self.last_revision)
+        changes = []
+        while self.revision > revision:
+            changes.extend(self.undo())
+        while self.revision < revision:
+            changes.extend(self.redo())
+        return changes
@@ -1,448 +1,807 @@
 import streamlit as st
 import json
-from io import BytesIO
+import hashlib
+import time
 import pandas as pd
-import struct
+import numpy as np
+from compare import compare_binaries
+from core import (
+    bilinear_resample,
+    apply_scaling,
+    axis_key,
+    compile_definition,
+    decode_map,
+    from_raw_values,
+    iter_layouts,
+    iter_patched_chunks,
+    multiply_maps,
+    patch_to_json,
+    quantize_breakpoints,
+    read_from_binary,
+    ScalarLayout,
+    scale_region,
+    smooth_region,
+    to_raw_values,
+)
+from history import EditJournal
+from pipeline import SaveJob
+import profiling
+from relocate import ByteIndex, relocate_definition
+from storage import BinaryImage
+from store import ContentStore
+from validate import validate_definition
+
+# Function to get the content hash of an uploaded file, computed once per upload
+def get_content_hash(uploaded_file):
+    content_hashes = st.session_state.setdefault("content_hashes", {})
+    if uploaded_file.file_id not in content_hashes:
+        content_hashes[uploaded_file.file_id] = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    return content_hashes[uploaded_file.file_id]
+
+# Function to parse and compile a JSON definition, cached by its content hash
+@st.cache_resource(max_entries=32, show_spinner=False)
+def load_definition(definition_hash, _json_bytes):
+    return compile_definition(json.loads(_json_bytes))
+
+# Function to check a definition's regions for overlaps, bounds and length mismatches against a binary size
+@st.cache_data(max_entries=32, show_spinner=False)
+def validate_definition_cached(definition_hash, binary_size, _json_bytes):
+    return validate_definition(json.loads(_json_bytes), binary_size)
+
+# Function to get the process-wide store of original images and decoded maps, shared by every session
+@st.cache_resource(show_spinner=False)
+def get_shared_store():
+    return ContentStore()
+
+# Function to get an upload's bytes from the shared store, so sessions uploading the same file share one copy
+def load_image_bytes(uploaded_file):
+    return get_shared_store().get_or_create(("image", get_content_hash(uploaded_file)), uploaded_file.getvalue)
+
+# Function to decode a map once per process, keyed by a digest of the map's own bytes so only changed maps are decoded again.
+# The shared array is read-only; sessions keep their edits separately.
+def decode_map_shared(map_digest, rows, columns, dtype, scaling, map_view):
+    def decode():
+        values = decode_map(map_view, 0, rows, columns, dtype, scaling)
+        values.setflags(write=False)
+        return values
+
+    return get_shared_store().get_or_create(("map", map_digest, rows, columns, dtype.str, scaling), decode)
+
+# Function to get a callback returning the partial values of a checksum of the original image from the shared store,
+# so each block is only hashed again when a save touches it
+def get_checksum_partials(uploaded_file, binary_data):
+    store = get_shared_store()
+    image_hash = get_content_hash(uploaded_file)
+    return lambda checksum: store.get_or_create(("checksum", image_hash, checksum.key), lambda: checksum.partials(binary_data))
+
+# Function to show the progress of a running save, polling until it is done
+@st.fragment(run_every=0.5)
+def display_save_progress(job):
+    if job.done:
+        st.rerun()
+    st.progress(job.progress, text=f"Saving: {job.stage}...")
+
+# Function to show a finished save: its issues, checksum corrections and downloads.
+# The downloads are built from the shared original and the patch only when they are clicked.
+def display_save_result(job, definition, binary_data, source_sha256, source_size):
+    if job.error is not None:
+        st.error(f"An unexpected error occurred while saving changes: {job.error}")
+        return
+    result = job.result
+    for level, message in result.issues:
+        getattr(st, level)(message)
+    for report in result.checksums:
+        if report["old"] != report["new"]:
+            st.info(f"Checksum '{report['name']}' ({report['algorithm']}) at {report['offset']} corrected from {report['old']} to {report['new']} "
+                    f"({report['dirty_blocks']} of {report['blocks']} block(s) rehashed).")
+        else:
+            st.info(f"Checksum '{report['name']}' ({report['algorithm']}) at {report['offset']} is already correct.")
+    st.success(f"Changes applied successfully. {result.patch.changed_bytes} byte(s) changed in {result.patch.regions} region(s).")
+    st.caption(f"SHA-256 of the modified binary: {result.sha256}")
+    st.download_button(
+        label="Download Modified Binary",
+        data=lambda: b"".join(iter_patched_chunks(binary_data, result.patch)),
+        file_name="modified_binary.bin",
+        mime="application/octet-stream"
+    )
+    st.download_button(
+        label="Download Patch (JSON)",
+        data=lambda: patch_to_json(result.patch, definition.calibration_id, source_sha256, source_size),
+        file_name="modified_binary.patch.json",
+        mime="application/json"
+    )
+
+# Function to label table columns or rows with axis breakpoints, or None when there are no usable breakpoints
+def axis_labels(breakpoints, count):
+    if breakpoints is None:
+        return None
+    labels = [f"{value:g}" for value in breakpoints]
+    # Labels must be unique to be used as DataFrame columns
+    return labels if len(set(labels)) == count else None
+
+# Function to get a map editor's values as a (rows, columns) array; missing cells are NaN and added rows are ignored
+def table_values(df, rows, columns):
+    values = np.full((rows, columns), np.nan)
+    current = df.to_numpy(dtype=np.float64, na_value=np.nan)[:rows, :columns]
+    values[:current.shape[0], :current.shape[1]] = current
+    return values
+
+# Function to parse comma-separated breakpoints
+def parse_breakpoints(text):
+    return np.array([float(value) for value in text.replace(";", ",").split(",") if value.strip()])
+
+# Function to compare several binaries, cached by the content hashes of the definition and binaries
+@st.cache_data(max_entries=16, show_spinner=False)
+def compare_binaries_cached(definition_hash, binary_hashes, _definition, _binaries):
+    return compare_binaries(_definition, _binaries)
+
+# Function to style a table of differences as a heatmap: red for increases, blue for decreases
+def diff_heatmap(diff):
+    df = pd.DataFrame(diff, columns=[f"Col {i+1}" for i in range(diff.shape[1])])
+    scale = np.nanmax(np.abs(diff), initial=0) or 1
+
+    def cell_style(value):
+        if np.isnan(value) or value == 0:
+            return ""
+        alpha = 0.2 + 0.8 * min(abs(value) / scale, 1)
+        color = "214, 39, 40" if value > 0 else "31, 119, 180"
+        return f"background-color: rgba({color}, {alpha:.2f})"
+
+    return df.style.map(cell_style).format("{:g}")
+
+# Function to render the compare mode: every defined parameter decoded from several binaries at once
+def display_compare():
+    uploaded_json = st.file_uploader("Upload JSON File", type=["json"], key="compare_json")
+    uploaded_binaries = st.file_uploader(
+        "Upload Binary Files (the first one is the reference)",
+        type=["bin", "dat", "exe"],
+        accept_multiple_files=True,
+        key="compare_binaries"
+    )
+    if not uploaded_json or len(uploaded_binaries) < 2:
+        st.info("Please upload a JSON file and at least two binary files to compare.")
+        return
+    definition_hash = get_content_hash(uploaded_json)
+    try:
+        definition = load_definition(definition_hash, uploaded_json.getvalue())
+    except json.JSONDecodeError as e:
+        st.error(f"Invalid JSON file: {e}")
+        return
+
+    names = [uploaded_binary.name for uploaded_binary in uploaded_binaries]
+    comparisons, issues = compare_binaries_cached(
+        definition_hash,
+        tuple(get_content_hash(uploaded_binary) for uploaded_binary in uploaded_binaries),
+        definition,
+        [load_image_bytes(uploaded_binary) for uploaded_binary in uploaded_binaries]
+    )
+    for level, message in issues:
+        getattr(st, level)(message)
+
+    # Summary of which parameters differ from the reference
+    differing = [comparison for comparison in comparisons if comparison.changed_cells]
+    st.header("Summary")
+    st.write(f"{len(differing)} of {len(comparisons)} parameter(s) differ from {names[0]}.")
+    only_differing = st.checkbox("Only show differing parameters", value=True)
+    shown = differing if only_differing else comparisons
+    summary = pd.DataFrame({
+        "Parameter": [comparison.name for comparison in shown],
+        "Group": [comparison.group for comparison in shown],
+        "Changed cells": [comparison.changed_cells for comparison in shown],
+        "Total cells": [comparison.total_cells for comparison in shown],
+    })
+    for index, name in enumerate(names[1:], start=1):
+        summary[f"Changed in {name}"] = [int(comparison.changed[index].sum()) for comparison in shown]
+    st.dataframe(summary, hide_index=True, width="stretch")
+
+    # Per-parameter diffs
+    st.header("Differences")
+    for comparison in differing:
+        with st.expander(f"{comparison.group} / {comparison.name} ({comparison.changed_cells} of {comparison.total_cells} changed)"):
+            if comparison.values.ndim == 1:
+                st.dataframe(pd.DataFrame([comparison.values], columns=names), hide_index=True)
+                continue
+            for index, name in enumerate(names[1:], start=1):
+                st.caption(f"{name} minus {names[0]}")
+                st.dataframe(diff_heatmap(comparison.values[index] - comparison.values[0]), width="stretch")
+
+# Function to render the instrumentation panel: this rerun's breakdown plus exports of the session totals
+def display_instrumentation(profiler, totals):
+    with st.sidebar.expander("Instrumentation", expanded=True):
+        rerun_seconds = profiler.totals().get("rerun", [0, 0.0])[1]
+        st.metric("Rerun time", f"{rerun_seconds * 1000:.1f} ms")
+        st.caption("By metric")
+        st.dataframe(pd.DataFrame(
+            [{"Metric": metric, "Calls": calls, "ms": seconds * 1000} for metric, (calls, seconds) in profiler.totals().items()]
+        ).sort_values("ms", ascending=False), hide_index=True, width="stretch")
+        rows = [row for row in profiler.rows() if row["map"]]
+        if rows:
+            group_time = {}
+            for row in rows:
+                group_time[row["group"]] = group_time.get(row["group"], 0.0) + row["seconds"]
+            st.caption("By group")
+            st.dataframe(pd.DataFrame(
+                [{"Group": group, "ms": seconds * 1000} for group, seconds in group_time.items()]
+            ).sort_values("ms", ascending=False), hide_index=True, width="stretch")
+            st.caption("Slowest maps")
+            st.dataframe(pd.DataFrame([{
+                "Map": row["map"],
+                "Group": row["group"],
+                "Metric": row["metric"],
+                "Calls": row["calls"],
+                "ms": row["seconds"] * 1000,
+            } for row in rows[:20]]), hide_index=True, width="stretch")
+        store = get_shared_store()
+        lookups = store.hits + store.misses
+        st.caption(
+            f"Shared store: {len(store)} entries, {store.nbytes / (1 << 20):.1f} of {store.budget / (1 << 20):.0f} MB, "
+            f"{store.hits / lookups if lookups else 0:.0%} hit rate, {store.evictions} eviction(s)"
+        )
+        st.caption(f"Session totals over {totals.reruns} rerun(s)")
+        st.download_button("Export JSON", data=totals.to_json(), file_name="instrumentation.json", mime="application/json")
+        st.download_button("Export Prometheus", data=totals.to_prometheus(), file_name="instrumentation.prom", mime="text/plain")
+
+# Function to build the byte-pattern index of a binary once per upload
+@st.cache_resource(max_entries=4, show_spinner="Indexing binary...")
+def load_byte_index(binary_hash, _binary_data):
+    return ByteIndex(_binary_data)
+
+# Function to render the relocate mode: find a definition's maps in a binary from another software revision
+def display_relocate():
+    uploaded_json = st.file_uploader("Upload JSON File", type=["json"], key="relocate_json")
+    uploaded_reference = st.file_uploader("Upload Reference Binary (matches the JSON offsets)", type=["bin", "dat", "exe"], key="relocate_reference")
+    uploaded_target = st.file_uploader("Upload Target Binary (new software revision)", type=["bin", "dat", "exe"], key="relocate_target")
+    if not (uploaded_json and uploaded_reference and uploaded_target):
+        st.info("Please upload a JSON file, the binary it was made for and the binary to relocate it to.")
+        return
+    try:
+        json_data = json.loads(uploaded_json.getvalue())
+    except json.JSONDecodeError as e:
+        st.error(f"Invalid JSON file: {e}")
+        return
+
+    target_data = load_image_bytes(uploaded_target)
+    target_index = load_byte_index(get_content_hash(uploaded_target), target_data)
+    relocated, located = relocate_definition(json_data, load_image_bytes(uploaded_reference), target_data, target_index)
+    unresolved = sum(entry["status"] == "unresolved" for entry in located)
+    inferred = sum(entry["status"] == "inferred" for entry in located)
+    if unresolved:
+        st.warning(f"{unresolved} region(s) could not be located and keep their original offsets.")
+    if inferred:
+        st.warning(f"{inferred} region(s) had no unique signature and were moved by the shift of the nearest located region.")
+    st.dataframe(pd.DataFrame({
+        "Region": [entry["name"] for entry in located],
+        "Status": [entry["status"] for entry in located],
+        "Old offset": [hex(entry["old_offset"]) for entry in located],
+        "New offset": [hex(entry["new_offset"]) if entry["new_offset"] is not None else "" for entry in located],
+        "Shift": [entry["shift"] for entry in located],
+        "Anchors matched": [f"{entry['anchors_matched']} / {entry['anchors']}" for entry in located],
+    }), hide_index=True, width="stretch")
+    st.download_button(
+        label="Download Relocated JSON",
+        data=json.dumps(relocated, indent=2, ensure_ascii=False),
+        file_name=uploaded_json.name.rsplit(".", 1)[0] + "_relocated.json",
+        mime="application/json"
+    )
 
 st.set_page_config(page_title="Binary File Editor", layout="wide")
+# Instrumentation is only switched on by the edit mode's toggle
+profiling.activate(None)
 
 st.title("Binary File Editor")
 
 st.markdown("""
-Upload a JSON configuration file and a binary file. 
+Upload a JSON configuration file and a binary file.
 Edit the parameters as needed and save the changes back to the binary file.
 """)
 
+mode = st.sidebar.radio(
+    "Mode",
+    ["Edit", "Compare", "Relocate"],
+    help="Compare decodes every defined parameter from several binaries. Relocate finds the defined maps in a new software revision."
+)
+if mode == "Compare":
+    display_compare()
+    st.stop()
+if mode == "Relocate":
+    display_relocate()
+    st.stop()
+
 # File Uploaders
 uploaded_json = st.file_uploader("Upload JSON File", type=["json"])
 uploaded_binary = st.file_uploader("Upload Binary File", type=["bin", "dat", "exe"])
 
 if uploaded_json and uploaded_binary:
     try:
-        json_data = json.load(uploaded_json)
+        definition = load_definition(get_content_hash(uploaded_json), uploaded_json.getvalue())
     except json.JSONDecodeError as e:
         st.error(f"Invalid JSON file: {e}")
         st.stop()
-    
-    binary_data = bytearray(uploaded_binary.read())
-    binary_size = len(binary_data)
+
+    # Wrap the shared copy of the original without copying it; this session's edits go into the image's overlay when saving
+    image = BinaryImage(load_image_bytes(uploaded_binary))
+    binary_data = image.buffer
+    binary_size = len(image)
     st.success(f"Binary file loaded successfully. Size: {binary_size} bytes.")
-    
-    # Initialize session state for edited data
-    if 'edited_values' not in st.session_state:
+
+    # Validation ran once when the definition was compiled and its regions were checked; show the findings in one place
+    definition_issues = definition.issues + validate_definition_cached(get_content_hash(uploaded_json), binary_size, uploaded_json.getvalue())
+    if definition_issues:
+        has_errors = any(level == "error" for level, _ in definition_issues)
+        with st.expander(f"Definition issues ({len(definition_issues)})", expanded=has_errors):
+            for level, message in definition_issues:
+                getattr(st, level)(message)
+
+    # Session state for edited data belongs to one definition and binary; start over when either upload changes
+    edit_context = (get_content_hash(uploaded_json), get_content_hash(uploaded_binary))
+    if st.session_state.get("edit_context") != edit_context:
+        # Remount the widgets of the previous edits
+        for name in st.session_state.get("edited_values", {}):
+            st.session_state.pop(name, None)
+        st.session_state.edit_context = edit_context
         st.session_state.edited_values = {}
-    
-    # Function to apply scaling
-    def apply_scaling(value, factor, offset):
-        return (value * factor) + offset
-    
-    # Function to reverse scaling
-    def reverse_scaling(value, factor, offset):
-        return (value - offset) / factor
-    
-    # Function to determine cell data type based on cell length
-    def get_cell_data_type(cell_length):
-        if cell_length == 1:
-            return "int8"
-        elif cell_length == 2:
-            return "int16"
-        elif cell_length == 4:
-            return "int32"
-        else:
-            return None  # Unsupported
-    
-    # Function to write a value to binary data
-    def write_to_binary(offset_hex, length, data_type, sign_type, value, scaling):
-        try:
-            offset = int(offset_hex, 16)
-        except ValueError:
-            st.error(f"Invalid offset format: {offset_hex}")
-            return
-        if offset + length > binary_size:
-            st.error(f"Offset {offset_hex} with length {length} exceeds binary file size.")
-            return
-        # Reverse scaling if necessary and not an array
-        if scaling and data_type != "array":
-            value = reverse_scaling(value, scaling.get('factor',1), scaling.get('offset',0))
-        # Pack the value based on data type
-        if data_type == "int8":
-            fmt = 'b' if sign_type == 'signed' else 'B'
-        elif data_type == "int16":
-            fmt = '<h' if sign_type == 'signed' else '<H'
-        elif data_type == "int32":
-            fmt = '<i' if sign_type == 'signed' else '<I'
-        elif data_type == "float":
-            fmt = '<f'
+        # Data each map editor was mounted with, as (map digest, DataFrame), memoized while its section is open
+        st.session_state.editor_base = {}
+        # Value each slider was first mounted with; a slider is only saved once it is moved away from it
+        st.session_state.slider_base = {}
+        # Undo/redo history of the edits, stored as per-cell deltas of raw values
+        st.session_state.journal = EditJournal()
+        st.session_state.pop("save_job", None)
+    journal = st.session_state.journal
+    layouts_by_name = {layout.name: layout for layout in iter_layouts(definition)}
+    # (scaling, integer cells) of every value the journal records; control sliders are stored as entered
+    raw_formats = {}
+    for name, layout in layouts_by_name.items():
+        integer = layout.codec.format[-1] != "f" if isinstance(layout, ScalarLayout) else layout.dtype.kind in "iu"
+        raw_formats[name] = (layout.scaling, integer)
+        for axis in (getattr(layout, "x_axis", None), getattr(layout, "y_axis", None)):
+            if axis is not None:
+                raw_formats[axis_key(axis)] = (axis.scaling, axis.dtype.kind in "iu")
+
+    lazy_rendering = st.sidebar.toggle(
+        "Lazy rendering",
+        value=True,
+        help="Only decode and render the map groups that are expanded."
+    )
+    instrumentation = st.sidebar.toggle(
+        "Instrumentation",
+        value=False,
+        help="Count and time binary reads and writes, struct packs, DataFrame and data editor builds per group and map."
+    )
+    # Everything until the end of the rerun is recorded into this rerun's profiler
+    profiler = profiling.Profiler() if instrumentation else None
+    profiling.activate(profiler)
+    rerun_start = time.perf_counter()
+
+    # Function to stage the raw cells of a value that changed since the last rerun in the edit journal
+    def record_edit(name, old, new):
+        if name in raw_formats:
+            old = to_raw_values(old, *raw_formats[name]).ravel()
+            new = to_raw_values(new, *raw_formats[name]).ravel()
         else:
-            st.error(f"Unsupported data type: {data_type}")
+            old = np.asarray(old, dtype=np.float64).ravel()
+            new = np.asarray(new, dtype=np.float64).ravel()
+        changed = np.flatnonzero(~((old == new) | (np.isnan(old) & np.isnan(new))))
+        journal.stage(name, changed, old[changed], new[changed])
+
+    # Function to apply values replayed from the edit journal and remount the affected widgets
+    def apply_journal_changes(changes):
+        changed_axes = set()
+        for name, cells, values in changes:
+            if name in raw_formats:
+                values = from_raw_values(values, raw_formats[name][0])
+            current = st.session_state.edited_values.get(name)
+            if isinstance(current, pd.DataFrame):
+                layout = layouts_by_name[name]
+                map_digest, mounted_df = st.session_state.editor_base[name]
+                table = table_values(current, layout.rows, layout.columns)
+                table.flat[cells] = values
+                new_df = pd.DataFrame(table, columns=mounted_df.columns, index=mounted_df.index)
+                st.session_state.edited_values[name] = new_df
+                st.session_state.editor_base[name] = (map_digest, new_df)
+            elif isinstance(current, np.ndarray):
+                # Axis breakpoints
+                current = current.copy()
+                current[cells] = values
+                st.session_state.edited_values[name] = current
+                changed_axes.add(name)
+            elif isinstance(current, (int, float)):
+                # Sliders keep the value's type so integer sliders stay integer
+                st.session_state.edited_values[name] = type(current)(values[-1])
+            st.session_state.pop(name, None)
+        relabel_tables(changed_axes)
+
+    # Function to get the column and row labels of a map's table from the current breakpoints of its axes
+    def table_labels(layout):
+        columns = axis_labels(read_axis(layout.x_axis), layout.columns) or [f"Col {i+1}" for i in range(layout.columns)]
+        return columns, axis_labels(read_axis(layout.y_axis), layout.rows)
+
+    # Function to remount the mounted map editors reading any of the given axes with labels from their new breakpoints
+    def relabel_tables(keys):
+        if not keys:
             return
-        try:
-            packed_data = struct.pack(fmt, value)
-            binary_data[offset:offset+len(packed_data)] = packed_data
-        except struct.error as e:
-            st.error(f"Error packing data: {e}")
-    
-    # Function to read a value from binary data
-    def read_from_binary(offset_hex, length, data_type, sign_type, scaling):
-        try:
-            offset = int(offset_hex, 16)
-        except ValueError:
-            st.error(f"Invalid offset format: {offset_hex}")
-            return None
-        if offset + length > binary_size:
-            st.error(f"Offset {offset_hex} with length {length} exceeds binary file size.")
-            return None
-        data_slice = binary_data[offset:offset+length]
-        # Unpack based on data type
-        if data_type == "int8":
-            fmt = 'b' if sign_type == 'signed' else 'B'
-        elif data_type == "int16":
-            fmt = '<h' if sign_type == 'signed' else '<H'
-        elif data_type == "int32":
-            fmt = '<i' if sign_type == 'signed' else '<I'
-        elif data_type == "float":
-            fmt = '<f'
-        else:
-            st.error(f"Unsupported data type: {data_type}")
+        for layout in layouts_by_name.values():
+            axes = (getattr(layout, "x_axis", None), getattr(layout, "y_axis", None))
+            current = st.session_state.edited_values.get(layout.name)
+            base = st.session_state.editor_base.get(layout.name)
+            if base is None or not isinstance(current, pd.DataFrame) or not any(axis is not None and axis_key(axis) in keys for axis in axes):
+                continue
+            columns, index = table_labels(layout)
+            new_df = pd.DataFrame(table_values(current, layout.rows, layout.columns), columns=columns, index=index)
+            st.session_state.edited_values[layout.name] = new_df
+            st.session_state.editor_base[layout.name] = (base[0], new_df)
+            st.session_state.pop(layout.name, None)
+
+    # Function to decode an axis's breakpoints, or None if the map has no usable axis; edited breakpoints come first
+    def read_axis(axis):
+        if axis is None:
             return None
+        if axis_key(axis) in st.session_state.edited_values:
+            return st.session_state.edited_values[axis_key(axis)]
         try:
-            value = struct.unpack(fmt, data_slice)[0]
-            # Apply scaling if necessary and not an array
-            if scaling and data_type != "array":
-                value = apply_scaling(value, scaling.get('factor',1), scaling.get('offset',0))
-            return value
-        except struct.error as e:
-            st.error(f"Error unpacking data: {e}")
+            axis_view = image.view(axis.offset, axis.length)
+        except ValueError as e:
+            st.warning(f"Axis '{axis.name}': {e}")
             return None
-    
-    # Iterate through map_groups and editable_maps
-    def process_maps(group_or_editable, group_name="", editable_only=False):
-        if group_name:
-            st.header(group_name)
-        for item in group_or_editable:
-            name = item.get("name")
-            description = item.get("description", "")
-            input_type = item.get("input_type")
-            data_type = item.get("data_type")
-            sign_type = item.get("sign_type", "unsigned")
-            scaling = item.get("scaling", {})
-            offset = item.get("offset")
-            length = item.get("length")
-            min_val = item.get("min_value")
-            max_val = item.get("max_value")
-            step = item.get("step", 1)
-            default = item.get("default_value")
-            map_dimension = item.get("map_dimension", {})
-            editable_columns = map_dimension.get("editable_columns", [])
-            editable_region = map_dimension.get("editable_region", {})
-            rows = map_dimension.get("rows", 0)
-            columns = map_dimension.get("columns", 0)
-            
-            st.subheader(name)
-            st.write(description)
-            
-            # Initialize edited_values if not present
-            if name not in st.session_state.edited_values:
-                st.session_state.edited_values[name] = {}
-            
-            if input_type == "slider":
-                # Validate slider parameters
-                if min_val is None or max_val is None or step is None:
-                    st.error(f"Slider '{name}' is missing 'min_value', 'max_value', or 'step'. Skipping.")
-                    continue
-                if not isinstance(min_val, (int, float)) or not isinstance(max_val, (int, float)) or not isinstance(step, (int, float)):
-                    st.error(f"Slider '{name}' has invalid 'min_value', 'max_value', or 'step' types. Skipping.")
-                    continue
-                if min_val > max_val:
-                    st.error(f"Slider '{name}' has 'min_value' greater than 'max_value'. Skipping.")
-                    continue
-                
-                # Read current value from binary
-                current_value = read_from_binary(offset, length, data_type, sign_type, scaling)
-                if current_value is None:
-                    current_value = default
-                if current_value is None:
-                    st.error(f"Slider '{name}' has no valid current or default value. Skipping.")
-                    continue
-                # Ensure current_value is within min and max
-                current_value = max(min_val, min(max_val, current_value))
+        axis_digest = hashlib.blake2b(axis_view, digest_size=16).hexdigest()
+        return decode_map_shared(axis_digest, 1, axis.count, axis.dtype, axis.scaling, axis_view)[0]
+
+    # Function to scale, smooth or resample a region of a map's editable cells in one NumPy pass
+    def display_table_tools(layout, map_view, map_digest):
+        name = layout.name
+        with st.popover("Rescale / smooth", key=f"tools:{name}"):
+            operation = st.selectbox("Operation", ["Scale", "Smooth", "Resample onto breakpoints"], key=f"tools:{name}:operation")
+            row_column, column_column = st.columns(2)
+            start_row, end_row = (0, 0)
+            if layout.rows > 1:
+                start_row, end_row = row_column.slider("Rows", 0, layout.rows - 1, (0, layout.rows - 1), key=f"tools:{name}:rows")
+            start_column, end_column = (0, 0)
+            if layout.columns > 1:
+                start_column, end_column = column_column.slider("Columns", 0, layout.columns - 1, (0, layout.columns - 1), key=f"tools:{name}:columns")
+
+            x_axis = read_axis(layout.x_axis)
+            if x_axis is None:
+                x_axis = np.arange(layout.columns, dtype=np.float64)
+            y_axis = read_axis(layout.y_axis)
+            if y_axis is None:
+                y_axis = np.arange(layout.rows, dtype=np.float64)
+            if operation == "Scale":
+                factor = st.number_input("Factor", value=1.0, step=0.01, key=f"tools:{name}:factor")
+                offset = st.number_input("Offset", value=0.0, key=f"tools:{name}:offset")
+            elif operation == "Resample onto breakpoints":
+                # The axes change for every cell, so the whole map is resampled and the new breakpoints are written to the axes
+                st.caption("Resamples the whole map and writes the new breakpoints to its axes.")
+                new_x_text = st.text_input("X breakpoints", ", ".join(f"{value:g}" for value in x_axis), key=f"tools:{name}:x",
+                                           disabled=layout.x_axis is None)
+                new_y_text = st.text_input("Y breakpoints", ", ".join(f"{value:g}" for value in y_axis), key=f"tools:{name}:y",
+                                           disabled=layout.y_axis is None)
+                for axis in (layout.x_axis, layout.y_axis):
+                    shared = [other.name for other in layouts_by_name.values() if other is not layout and axis is not None
+                              and any(other_axis is not None and other_axis.offset == axis.offset
+                                      for other_axis in (getattr(other, "x_axis", None), getattr(other, "y_axis", None)))]
+                    if shared:
+                        st.warning(f"The axis at {hex(axis.offset)} is shared with {', '.join(shared)}. "
+                                   f"Their tables are not resampled and will be read against the new breakpoints.")
+
+            if not st.button("Apply", key=f"tools:{name}:apply"):
+                return
+
+            # Start from the binary's values with the current edits on top
+            values = decode_map_shared(map_digest, layout.rows, layout.columns, layout.dtype, layout.scaling, map_view)
+            current = st.session_state.edited_values[name]
+            if isinstance(current, pd.DataFrame):
+                current = current.to_numpy(dtype=np.float64, na_value=np.nan)
+                if current.shape[0] >= layout.rows and current.shape[1] >= layout.columns:
+                    current = current[:layout.rows, :layout.columns]
+                    values = np.where(layout.editable_mask & ~np.isnan(current), current, values)
+
+            region = np.zeros((layout.rows, layout.columns), dtype=bool)
+            region[start_row:end_row + 1, start_column:end_column + 1] = True
+            region &= layout.editable_mask
+            if operation == "Scale":
+                values = scale_region(values, region, factor, offset)
+            elif operation == "Smooth":
+                values = smooth_region(values, region)
+            else:
                 try:
-                    edited_val = st.slider(
-                        label=name,
-                        min_value=min_val,
-                        max_value=max_val,
-                        value=current_value,
-                        step=step,
-                        key=name
-                    )
-                    st.session_state.edited_values[name] = edited_val
-                except Exception as e:
-                    st.error(f"Error creating slider '{name}': {e}")
-            
-            elif input_type == "map_multiplier":
-                # Skip individual map_multiplier sliders; handled by group control_slider
-                continue
-            
-            elif input_type == "map_editor":
-                if rows == 0 or columns == 0:
-                    st.warning(f"Map '{name}' has invalid rows or columns.")
-                    continue
-                # Calculate cell_length and cell_data_type
-                cell_length = length // (rows * columns)
-                cell_data_type = get_cell_data_type(cell_length)
-                if cell_data_type is None:
-                    st.error(f"Unsupported cell length {cell_length} in map '{name}'. Skipping.")
-                    continue
-                
-                # Read current map data from binary
-                map_data = []
-                for row in range(rows):
-                    row_data = []
-                    for col in range(columns):
-                        # Calculate offset for each cell if applicable
-                        # For simplicity, assume contiguous storage row-wise
-                        cell_offset = int(offset, 16) + (row * columns + col) * cell_length
-                        cell_value = read_from_binary(hex(cell_offset), cell_length, cell_data_type, sign_type, scaling)
-                        row_data.append(cell_value)
-                    map_data.append(row_data)
-                
-                df = pd.DataFrame(map_data, columns=[f"Col {i+1}" for i in range(columns)])
-                
-                # Determine which cells are editable
-                editable_mask = pd.DataFrame(False, index=df.index, columns=df.columns)
-                if editable_columns == "all":
-                    editable_mask = pd.DataFrame(True, index=df.index, columns=df.columns)
-                elif isinstance(editable_columns, list):
-                    for col in editable_columns:
-                        if isinstance(col, int) and 0 <= col < columns:
-                            editable_mask.iloc[:, col] = True
-                        else:
-                            st.warning(f"Invalid column index '{col}' in map '{name}'. Skipping column editing for this index.")
-                elif editable_region:
-                    start_row = editable_region.get("start_row", 0)
-                    end_row = editable_region.get("end_row", rows - 1)
-                    start_column = editable_region.get("start_column", 0)
-                    end_column = editable_region.get("end_column", columns - 1)
-                    for r in range(start_row, end_row + 1):
-                        for c in range(start_column, end_column + 1):
-                            if 0 <= r < rows and 0 <= c < columns:
-                                editable_mask.iat[r, c] = True
-                else:
-                    st.warning(f"No editable columns or regions specified for map '{name}'. All cells set to read-only.")
-                
-                # Extract editable data
-                editable_data = df.where(editable_mask)
-                
+                    new_x = parse_breakpoints(new_x_text) if layout.x_axis is not None else x_axis
+                    new_y = parse_breakpoints(new_y_text) if layout.y_axis is not None else y_axis
+                except ValueError:
+                    st.error("Breakpoints must be comma-separated numbers.")
+                    return
+                if new_x.size != layout.columns or new_y.size != layout.rows:
+                    st.error(f"Enter {layout.columns} X breakpoints and {layout.rows} Y breakpoints.")
+                    return
+                if not layout.editable_mask.all():
+                    st.error(f"Map '{name}' has read-only cells, which would no longer match the new breakpoints.")
+                    return
                 try:
+                    # Resample onto the breakpoints as the axes will store them
+                    if layout.x_axis is not None:
+                        new_x = quantize_breakpoints(layout.x_axis, new_x)
+                    if layout.y_axis is not None:
+                        new_y = quantize_breakpoints(layout.y_axis, new_y)
+                except ValueError as e:
+                    st.error(str(e))
+                    return
+                values = bilinear_resample(values, x_axis, y_axis, new_x, new_y)
+                changed_axes = set()
+                for axis, old, new in ((layout.x_axis, x_axis, new_x), (layout.y_axis, y_axis, new_y)):
+                    if axis is not None and not np.array_equal(old, new):
+                        record_edit(axis_key(axis), old, new)
+                        st.session_state.edited_values[axis_key(axis)] = new
+                        changed_axes.add(axis_key(axis))
+
+            # Remount the editor with the new values, labelled with the current breakpoints
+            columns, index = table_labels(layout)
+            new_df = pd.DataFrame(np.where(layout.editable_mask, values, np.nan), columns=columns, index=index)
+            record_edit(name, table_values(st.session_state.edited_values[name], layout.rows, layout.columns), new_df.to_numpy())
+            journal.commit()
+            st.session_state.edited_values[name] = new_df
+            st.session_state.editor_base[name] = (map_digest, new_df)
+            del st.session_state[name]
+            if operation == "Resample onto breakpoints":
+                # Maps sharing the axes are read against the new breakpoints too
+                relabel_tables(changed_axes)
+            st.rerun()
+
+    # Function to render the widget of a single slider, map or readonly value
+    def process_map(layout):
+        name = layout.name
+
+        # map_multiplier maps are handled by the group control_slider
+        if layout.input_type == "map_multiplier":
+            return
+
+        st.subheader(name)
+        st.write(layout.description)
+
+        # Initialize edited_values if not present
+        if name not in st.session_state.edited_values:
+            st.session_state.edited_values[name] = {}
+
+        if layout.input_type == "slider":
+            # Keep the last edit when the slider's section is reopened, otherwise read from binary
+            current_value = st.session_state.edited_values[name]
+            if not isinstance(current_value, (int, float)):
+                try:
+                    current_value = read_from_binary(binary_data, layout.offset, layout.codec, layout.scaling)
+                except ValueError as e:
+                    st.error(str(e))
+                    current_value = None
+            if current_value is None:
+                current_value = layout.default_value
+            if current_value is None:
+                st.error(f"Slider '{name}' has no valid current or default value. Skipping.")
+                return
+            # Ensure current_value is within min and max
+            current_value = max(layout.min_value, min(layout.max_value, current_value))
+            st.session_state.slider_base.setdefault(name, current_value)
+            previous_value = st.session_state.edited_values[name]
+            try:
+                edited_val = st.slider(
+                    label=name,
+                    min_value=layout.min_value,
+                    max_value=layout.max_value,
+                    value=current_value,
+                    step=layout.step,
+                    key=name
+                )
+                if isinstance(previous_value, (int, float)):
+                    record_edit(name, previous_value, edited_val)
+                st.session_state.edited_values[name] = edited_val
+            except Exception as e:
+                st.error(f"Error creating slider '{name}': {e}")
+
+        elif layout.input_type == "map_editor":
+            # Read current map data from a zero-copy view of the binary in one pass
+            try:
+                map_view = image.view(layout.offset, layout.length)
+            except ValueError as e:
+                st.error(str(e))
+                return
+            map_digest = hashlib.blake2b(map_view, digest_size=16).hexdigest()
+
+            # While the editor stays mounted it keeps the data it was mounted with, so nothing is decoded again
+            base = st.session_state.editor_base.get(name)
+            previous_df = st.session_state.edited_values[name]
+            if name not in st.session_state or base is None or base[0] != map_digest:
+                edited_df = st.session_state.edited_values[name]
+                if isinstance(edited_df, pd.DataFrame) and base is not None and base[0] == map_digest:
+                    # Reopened section: continue from the last edits
+                    editable_data = edited_df
+                else:
+                    map_values = decode_map_shared(map_digest, layout.rows, layout.columns, layout.dtype, layout.scaling, map_view)
+
+                    # Label columns and rows with the axis breakpoints when the definition has them
+                    columns, y_labels = table_labels(layout)
+                    with profiling.timer("dataframe"):
+                        df = pd.DataFrame(map_values, columns=columns, index=y_labels)
+
+                        # Extract editable data; edits made against other binary contents are not history
+                        editable_data = df.where(layout.editable_mask)
+                    previous_df = None
+                base = (map_digest, editable_data)
+                st.session_state.editor_base[name] = base
+
+            try:
+                with profiling.timer("data_editor"):
                     edited_df = st.data_editor(
-                        editable_data,
+                        base[1],
                         num_rows="dynamic",
-                        use_container_width=True,
+                        width="stretch",
                         key=name
                     )
-                    st.session_state.edited_values[name] = edited_df
-                except Exception as e:
-                    st.error(f"Error creating data editor for map '{name}': {e}")
-            
-            elif input_type == "readonly":
-                # Display the value without allowing edits
-                current_value = read_from_binary(offset, length, data_type, sign_type, scaling)
-                if current_value is None:
-                    current_value = default
-                st.text(f"Value: {current_value}")
-            
-            else:
-                st.warning(f"Unsupported input type: {input_type}")
-    
-    # Function to process all map groups and editable maps
-    def display_maps():
-        st.header("Map Groups")
-        for group in json_data.get("map_groups", []):
-            group_name = group.get("group_name", "Unnamed Group")
-            maps = group.get("maps", [])
-            process_maps(maps, group_name=group_name)
-            
-            # Handle control sliders if any
-            control_slider = group.get("control_slider")
-            if control_slider:
-                cs_name = control_slider.get("name")
-                cs_description = control_slider.get("description", "")
-                cs_min = control_slider.get("min_value")
-                cs_max = control_slider.get("max_value")
-                cs_step = control_slider.get("step", 0.1)
-                cs_default = control_slider.get("default_value", 1.0)
-                
-                # Validate control slider parameters
-                if cs_min is None or cs_max is None or cs_step is None:
-                    st.error(f"Control slider '{cs_name}' is missing 'min_value', 'max_value', or 'step'. Skipping.")
-                    continue
-                if not isinstance(cs_min, (int, float)) or not isinstance(cs_max, (int, float)) or not isinstance(cs_step, (int, float)):
-                    st.error(f"Control slider '{cs_name}' has invalid 'min_value', 'max_value', or 'step' types. Skipping.")
-                    continue
-                if cs_min > cs_max:
-                    st.error(f"Control slider '{cs_name}' has 'min_value' greater than 'max_value'. Skipping.")
-                    continue
-                
+                if isinstance(previous_df, pd.DataFrame):
+                    record_edit(name, table_values(previous_df, layout.rows, layout.columns), table_values(edited_df, layout.rows, layout.columns))
+                st.session_state.edited_values[name] = edited_df
+            except Exception as e:
+                st.error(f"Error creating data editor for map '{name}': {e}")
+                return
+
+            if layout.editable_mask.any():
+                display_table_tools(layout, map_view, map_digest)
+
+        elif layout.input_type == "readonly":
+            # Display the value without allowing edits
+            try:
+                current_value = read_from_binary(binary_data, layout.offset, layout.codec, layout.scaling)
+            except ValueError as e:
+                st.error(str(e))
+                current_value = None
+            if current_value is None:
+                current_value = layout.default_value
+            st.text(f"Value: {current_value}")
+
+    # Iterate through map_groups and editable_maps, attributing the instrumentation of each map to its group
+    def process_maps(layouts, group_name, show_header):
+        if show_header:
+            st.header(group_name)
+        for layout in layouts:
+            with profiling.scope(group_name, layout.name):
+                process_map(layout)
+
+    # Function to get the container for a section, or None when lazy rendering and the section is collapsed
+    def open_section(section_name):
+        if not lazy_rendering:
+            return st.container()
+        section = st.expander(section_name, key=f"section:{section_name}", on_change="rerun")
+        return section if section.open else None
+
+    # Function to render a map group and its control slider
+    def display_group(group):
+        process_maps(group.maps, group.name, not lazy_rendering)
+
+        # Handle control sliders if any
+        control_slider = group.control_slider
+        if control_slider:
+            cs_name = control_slider.name
+            with profiling.scope(group.name, cs_name):
                 st.subheader(cs_name)
-                st.write(cs_description)
-                current_cs = st.session_state.edited_values.get(cs_name, cs_default)
+                st.write(control_slider.description)
+                current_cs = st.session_state.edited_values.get(cs_name, control_slider.default_value)
                 # Ensure current_cs is within min and max
-                current_cs = max(cs_min, min(cs_max, current_cs))
+                current_cs = max(control_slider.min_value, min(control_slider.max_value, current_cs))
+                st.session_state.slider_base.setdefault(cs_name, current_cs)
+                previous_cs = st.session_state.edited_values.get(cs_name)
                 try:
                     edited_cs = st.slider(
                         label=cs_name,
-                        min_value=cs_min,
-                        max_value=cs_max,
+                        min_value=control_slider.min_value,
+                        max_value=control_slider.max_value,
                         value=current_cs,
-                        step=cs_step,
+                        step=control_slider.step,
                         key=cs_name
                     )
+                    if isinstance(previous_cs, (int, float)):
+                        record_edit(cs_name, previous_cs, edited_cs)
                     st.session_state.edited_values[cs_name] = edited_cs
                 except Exception as e:
                     st.error(f"Error creating control slider '{cs_name}': {e}")
-        
+                    return
+                display_multiplier_preview(group, edited_cs)
+
+    # Function to preview a group's map_multiplier maps before and after scaling by the control slider value.
+    # The preview is only computed while it is expanded.
+    def display_multiplier_preview(group, multiplier):
+        layouts = [layout for layout in group.maps if layout.input_type == "map_multiplier"]
+        if not layouts:
+            return
+        preview = st.expander(f"Preview: {len(layouts)} map(s) scaled by {multiplier:g}", key=f"preview:{group.name}", on_change="rerun")
+        if not preview.open:
+            return
+        with preview:
+            try:
+                results = multiply_maps(binary_data, layouts, [multiplier] * len(layouts))
+            except ValueError as e:
+                st.error(str(e))
+                return
+            for layout, (old, new, clamped) in zip(layouts, results):
+                st.caption(f"{layout.name}" + (f" ({clamped} cell(s) clamped to the range of {layout.dtype.name})" if clamped else ""))
+                columns, index = table_labels(layout)
+                before_column, after_column = st.columns(2)
+                for column, label, raw in ((before_column, "Before", old), (after_column, "After", new)):
+                    values = raw.astype(np.float64)
+                    if layout.scaling:
+                        values = apply_scaling(values, *layout.scaling)
+                    column.write(label)
+                    column.dataframe(pd.DataFrame(values, columns=columns, index=index), width="stretch")
+
+    # Function to process all map groups and editable maps
+    def display_maps():
+        st.header("Map Groups")
+        for group in definition.groups:
+            section = open_section(group.name)
+            if section is None:
+                continue
+            with section:
+                display_group(group)
+
         st.header("Editable Maps")
-        editable_maps = json_data.get("editable_maps", [])
-        process_maps(editable_maps, group_name="Editable Maps")
-    
+        section = open_section("Editable Maps")
+        if section is not None:
+            with section:
+                process_maps(definition.editable_maps, "Editable Maps", not lazy_rendering)
+
     display_maps()
-    
-    # Save Button
-    if st.button("Save Changes"):
-        try:
-            # Apply edited values to binary_data
-            # Process map_groups
-            for group in json_data.get("map_groups", []):
-                maps = group.get("maps", [])
-                for map_item in maps:
-                    name = map_item.get("name")
-                    input_type = map_item.get("input_type")
-                    data_type = map_item.get("data_type")
-                    sign_type = map_item.get("sign_type", "unsigned")
-                    scaling = map_item.get("scaling", {})
-                    offset = map_item.get("offset")
-                    length = map_item.get("length")
-                    
-                    if input_type == "slider":
-                        value = st.session_state.edited_values.get(name, map_item.get("default_value"))
-                        write_to_binary(offset, length, data_type, sign_type, value, scaling)
-                    
-                    elif input_type == "map_multiplier":
-                        # Handled by group control_slider
-                        multiplier = st.session_state.edited_values.get(group.get("control_slider", {}).get("name"), scaling.get("factor",1))
-                        # Apply multiplier to all related maps
-                        for related_map in maps:
-                            if related_map.get("input_type") == "map_multiplier":
-                                continue
-                            related_data_type = related_map.get("data_type")
-                            if related_data_type == "array":
-                                # Do not write scaling factors back to binary
-                                st.warning(f"Skipping writing scaling factor for map '{related_map.get('name')}' as it has data_type 'array'")
-                                # Update scaling factor in JSON to be used in display
-                                related_map_scaling = related_map.get("scaling", {})
-                                original_factor = related_map_scaling.get("factor",1)
-                                new_factor = original_factor * multiplier
-                                related_map_scaling['factor'] = new_factor
-                                related_map['scaling'] = related_map_scaling
-                            else:
-                                # For non-array data_types, update scaling factor in binary
-                                map_name = related_map.get("name")
-                                map_scaling = related_map.get("scaling", {})
-                                original_factor = map_scaling.get("factor",1)
-                                new_factor = original_factor * multiplier
-                                map_scaling['factor'] = new_factor
-                                related_map['scaling'] = map_scaling
-                                # Update binary with new scaling factor
-                                write_to_binary(related_map.get("offset"), related_map.get("length"), related_map.get("data_type"), related_map.get("sign_type", "unsigned"), new_factor, {})
-                    
-                    elif input_type == "map_editor":
-                        edited_df = st.session_state.edited_values.get(name)
-                        if edited_df is not None:
-                            map_dimension = map_item.get("map_dimension", {})
-                            editable_columns = map_dimension.get("editable_columns", [])
-                            editable_region = map_dimension.get("editable_region", {})
-                            rows = map_dimension.get("rows", 0)
-                            columns = map_dimension.get("columns", 0)
-                            
-                            if editable_columns or editable_region:
-                                # Calculate cell_length and cell_data_type
-                                cell_length = length // (rows * columns)
-                                cell_data_type = get_cell_data_type(cell_length)
-                                if cell_data_type is None:
-                                    st.error(f"Unsupported cell length {cell_length} in map '{name}'. Skipping.")
-                                    continue
-                                
-                                for r in range(rows):
-                                    for c in range(columns):
-                                        # Check if the cell is editable
-                                        is_editable = False
-                                        if editable_columns == "all":
-                                            is_editable = True
-                                        elif isinstance(editable_columns, list) and c in editable_columns:
-                                            is_editable = True
-                                        if editable_region:
-                                            if (editable_region.get("start_row", 0) <= r <= editable_region.get("end_row", rows-1) and
-                                                editable_region.get("start_column", 0) <= c <= editable_region.get("end_column", columns-1)):
-                                                is_editable = True
-                                        if is_editable:
-                                            cell_value = edited_df.iat[r, c]
-                                            # Calculate cell offset
-                                            cell_offset = int(offset, 16) + (r * columns + c) * cell_length
-                                            write_to_binary(hex(cell_offset), cell_length, cell_data_type, sign_type, cell_value, scaling)
-                    
-                    # Add other input_types as needed
-            
-                # Handle control sliders
-                control_slider = group.get("control_slider")
-                if control_slider:
-                    cs_name = control_slider.get("name")
-                    cs_value = st.session_state.edited_values.get(cs_name, control_slider.get("default_value", 1.0))
-                    multiplier = cs_value
-                    for related_map in maps:
-                        if related_map.get("input_type") in ["map_editor", "map_multiplier"]:
-                            related_data_type = related_map.get("data_type")
-                            if related_data_type == "array":
-                                # Do not write scaling factors back to binary
-                                st.warning(f"Skipping writing scaling factor for map '{related_map.get('name')}' as it has data_type 'array'")
-                                # Update scaling factor in JSON to be used in display
-                                related_map_scaling = related_map.get("scaling", {})
-                                original_factor = related_map_scaling.get("factor",1)
-                                new_factor = original_factor * multiplier
-                                related_map_scaling['factor'] = new_factor
-                                related_map['scaling'] = related_map_scaling
-                            else:
-                                # For non-array data_types, update scaling factor in binary
-                                map_scaling = related_map.get("scaling", {})
-                                original_factor = map_scaling.get("factor",1)
-                                new_factor = original_factor * multiplier
-                                map_scaling['factor'] = new_factor
-                                related_map['scaling'] = map_scaling
-                                write_to_binary(related_map.get("offset"), related_map.get("length"), related_map.get("data_type"), related_map.get("sign_type", "unsigned"), new_factor, {})
-        
-        # Process editable_maps
-            for editable_map in json_data.get("editable_maps", []):
-                name = editable_map.get("name")
-                input_type = editable_map.get("input_type")
-                data_type = editable_map.get("data_type")
-                sign_type = editable_map.get("sign_type", "unsigned")
-                scaling = editable_map.get("scaling", {})
-                offset = editable_map.get("offset")
-                length = editable_map.get("length")
-                
-                if input_type == "slider":
-                    value = st.session_state.edited_values.get(name, editable_map.get("default_value"))
-                    write_to_binary(offset, length, data_type, sign_type, value, scaling)
-        
-            # Provide the modified binary for download
-            st.success("Changes applied successfully.")
-            modified_binary = BytesIO(binary_data)
-            st.download_button(
-                label="Download Modified Binary",
-                data=modified_binary,
-                file_name="modified_binary.bin",
-                mime="application/octet-stream"
-            )
-        except Exception as e:
-            st.error(f"An unexpected error occurred while saving changes: {e}")
+    # Everything edited in this rerun is one undo step
+    journal.commit()
+
+    # Undo, redo and jump to a revision; the affected widgets are remounted with the replayed values
+    st.sidebar.subheader("History")
+    undo_column, redo_column = st.sidebar.columns(2)
+    replay = None
+    if undo_column.button("Undo", disabled=not journal.can_undo, width="stretch"):
+        replay = journal.undo()
+    if redo_column.button("Redo", disabled=not journal.can_redo, width="stretch"):
+        replay = journal.redo()
+    if journal.last_revision > journal.first_revision:
+        target_revision = st.sidebar.slider("Revision", journal.first_revision, journal.last_revision, value=journal.revision)
+        if replay is None and target_revision != journal.revision:
+            replay = journal.jump(target_revision)
+    st.sidebar.caption(f"Revision {journal.revision} of {journal.last_revision}, {journal.nbytes:,} bytes of history.")
+    if replay is not None:
+        apply_journal_changes(replay)
+        st.rerun()
+
+    # Save in a worker thread; the result is shown once it is done and kept until the edits change
+    save_job = st.session_state.get("save_job")
+    if save_job is not None and save_job[0] != (get_content_hash(uploaded_binary), journal.revision):
+        st.session_state.pop("save_job")
+        save_job = None
+    if st.button("Save Changes", disabled=save_job is not None and not save_job[1].done):
+        # Collect the edited values; the worker writes them into its own overlay of the shared original.
+        # Sliders still at the value they were mounted with are left out, so a clamped binary value is not written back.
+        values = {}
+        for name, value in st.session_state.edited_values.items():
+            if name in st.session_state.slider_base and value == st.session_state.slider_base[name]:
+                continue
+            if isinstance(value, pd.DataFrame):
+                values[name] = value.to_numpy(dtype=np.float64, na_value=np.nan)
+            elif not isinstance(value, dict):
+                values[name] = value
+        save_job = ((get_content_hash(uploaded_binary), journal.revision),
+                    SaveJob(BinaryImage(binary_data), definition, values, get_checksum_partials(uploaded_binary, binary_data),
+                            profiling.Profiler() if profiler is not None else None))
+        st.session_state.save_job = save_job
+    if save_job is not None:
+        if save_job[1].done:
+            # The save's instrumentation is counted once, with the rerun that shows its result
+            job_profiler, save_job[1].profiler = save_job[1].profiler, None
+            totals = profiler if profiler is not None else st.session_state.get("profile_totals")
+            if job_profiler is not None and totals is not None:
+                totals.merge(job_profiler)
+            display_save_result(save_job[1], definition, binary_data, get_content_hash(uploaded_binary), binary_size)
+        else:
+            display_save_progress(save_job[1])
+
+    if profiler is not None:
+        profiler.record("rerun", time.perf_counter() - rerun_start)
+        profiler.reruns = 1
+        profiling.activate(None)
+        if 'profile_totals' not in st.session_state:
+            st.session_state.profile_totals = profiling.Profiler()
+        st.session_state.profile_totals.merge(profiler)
+        display_instrumentation(profiler, st.session_state.profile_totals)
 else:
     st.info("Please upload both JSON and binary files to proceed.")
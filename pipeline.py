@@ -0,0 +1,89 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+
+from checksums import correct_checksum
+from core import Patch, byte_write, collect_writes
+import profiling
+
+# Outcome of a save: issues, checksum corrections, the patch against the original and the hash of the output.
+# The output itself is not kept; it is rebuilt from the original and the patch when it is needed.
+@dataclass(slots=True)
+class SaveResult:
+    issues: list
+    checksums: list
+    patch: Patch
+    sha256: str
+
+# Function to write the edited values into an image's overlay, then correct every checksum of the definition.
+# Checksums are corrected in definition order against the overlay so far, so a later checksum may cover an earlier one.
+# get_partials(checksum) may return cached partial values of the original image; progress(fraction, stage) is optional.
+# Returns (issues, checksum reports).
+def prepare_save(image, definition, values, get_partials=None, progress=None):
+    progress = progress or (lambda fraction, stage: None)
+    progress(0.0, "Applying edits")
+    writes, issues = collect_writes(image.buffer, definition, values)
+    image.write(writes)
+    reports = []
+    for index, checksum in enumerate(definition.checksums):
+        progress(0.3 + 0.3 * index / len(definition.checksums), f"Correcting checksum '{checksum.name}'")
+        try:
+            write, report = correct_checksum(image.buffer, image.patch(), checksum, get_partials)
+        except ValueError as e:
+            issues.append(("error", str(e)))
+            continue
+        if write is not None:
+            image.write([byte_write(*write)])
+        reports.append(report)
+    return issues, reports
+
+# Function to get the SHA-256 of an image's output, streamed in chunks so it is never built whole and progress is reported
+def hash_output(image, progress=None):
+    progress = progress or (lambda fraction, stage: None)
+    output_hash = hashlib.sha256()
+    hashed = 0
+    for chunk in image.iter_chunks():
+        progress(0.6 + 0.4 * hashed / len(image), "Hashing output")
+        output_hash.update(chunk)
+        hashed += len(chunk)
+    progress(1.0, "Done")
+    return output_hash.hexdigest()
+
+# Function to run the whole save of the edited values against an image
+def run_save(image, definition, values, get_partials=None, progress=None):
+    issues, reports = prepare_save(image, definition, values, get_partials, progress)
+    return SaveResult(issues, reports, image.patch(), hash_output(image, progress))
+
+# A save running in a daemon worker thread so the UI stays responsive; poll done, then read result or error.
+# The caller must not write to the image after handing it over.
+# The thread starts without the caller's active profiler, so the save records into its own profiler when one is given.
+class SaveJob:
+    __slots__ = ("progress", "stage", "result", "error", "profiler", "_thread")
+
+    def __init__(self, image, definition, values, get_partials=None, profiler=None):
+        self.progress = 0.0
+        self.stage = "Queued"
+        self.result = None
+        self.error = None
+        self.profiler = profiler
+        self._thread = threading.Thread(target=self._run, args=(image, definition, values, get_partials), daemon=True)
+        self._thread.start()
+
+    @property
+    def done(self):
+        return not self._thread.is_alive()
+
+    # Function to wait for the save to finish
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _report(self, fraction, stage):
+        self.progress = fraction
+        self.stage = stage
+
+    def _run(self, image, definition, values, get_partials):
+        profiling.activate(self.profiler)
+        try:
+            self.result = run_save(image, definition, values, get_partials, self._report)
+        except Exception as e:
+            self.error = e
@@ -0,0 +1,131 @@
+import functools
+import json
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+# Profiler of the current script run; None when instrumentation is off, so instrumented code only pays a lookup
+_active = ContextVar("active_profiler", default=None)
+
+# Calls and time per (metric, group, map), collected while a profiler is active
+class Profiler:
+    __slots__ = ("stats", "reruns", "_scope")
+
+    def __init__(self):
+        # (metric, group, map) -> [calls, seconds]
+        self.stats = {}
+        self.reruns = 0
+        self._scope = ("", "")
+
+    # Function to add calls and time to a metric of the current group and map
+    def record(self, metric, seconds=0.0, calls=1):
+        entry = self.stats.setdefault((metric, *self._scope), [0, 0.0])
+        entry[0] += calls
+        entry[1] += seconds
+
+    # Function to attribute everything recorded inside the block to a group and map
+    @contextmanager
+    def scope(self, group, map_name):
+        previous = self._scope
+        self._scope = (group, map_name)
+        try:
+            yield
+        finally:
+            self._scope = previous
+
+    # Function to time the block as one call of a metric
+    @contextmanager
+    def timer(self, metric):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(metric, time.perf_counter() - start)
+
+    # Function to add another profiler's stats, e.g. one rerun into the session totals
+    def merge(self, other):
+        for key, (calls, seconds) in other.stats.items():
+            entry = self.stats.setdefault(key, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+        self.reruns += other.reruns
+
+    # Function to list the stats as records, slowest first
+    def rows(self):
+        return sorted(
+            ({"metric": metric, "group": group, "map": map_name, "calls": calls, "seconds": seconds}
+             for (metric, group, map_name), (calls, seconds) in self.stats.items()),
+            key=lambda row: row["seconds"],
+            reverse=True
+        )
+
+    # Function to total calls and time per metric, or per metric and group
+    def totals(self, by_group=False):
+        totals = {}
+        for (metric, group, _), (calls, seconds) in self.stats.items():
+            entry = totals.setdefault((metric, group) if by_group else metric, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+        return totals
+
+    def to_json(self):
+        return json.dumps({"reruns": self.reruns, "stats": self.rows()}, indent=2)
+
+    # Function to export the stats as Prometheus text exposition format counters
+    def to_prometheus(self, prefix="binary_editor"):
+        def label(value):
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        lines = [
+            f"# HELP {prefix}_reruns_total Number of profiled script reruns.",
+            f"# TYPE {prefix}_reruns_total counter",
+            f"{prefix}_reruns_total {self.reruns}",
+            f"# HELP {prefix}_calls_total Number of instrumented calls.",
+            f"# TYPE {prefix}_calls_total counter",
+        ]
+        rows = self.rows()
+        for row in rows:
+            lines.append(f'{prefix}_calls_total{{metric="{label(row["metric"])}",group="{label(row["group"])}",map="{label(row["map"])}"}} {row["calls"]}')
+        lines += [
+            f"# HELP {prefix}_seconds_total Time spent in instrumented calls.",
+            f"# TYPE {prefix}_seconds_total counter",
+        ]
+        for row in rows:
+            lines.append(f'{prefix}_seconds_total{{metric="{label(row["metric"])}",group="{label(row["group"])}",map="{label(row["map"])}"}} {row["seconds"]:.9f}')
+        return "\n".join(lines) + "\n"
+
+# Function to make a profiler the active one for the current script run, or turn instrumentation off with None
+def activate(profiler):
+    _active.set(profiler)
+
+# Function to add calls and time to a metric of the active profiler
+def record(metric, seconds=0.0, calls=1):
+    profiler = _active.get()
+    if profiler is not None:
+        profiler.record(metric, seconds, calls)
+
+# Function to attribute the block to a group and map of the active profiler
+def scope(group, map_name):
+    profiler = _active.get()
+    return profiler.scope(group, map_name) if profiler is not None else nullcontext()
+
+# Function to time the block with the active profiler
+def timer(metric):
+    profiler = _active.get()
+    return profiler.timer(metric) if profiler is not None else nullcontext()
+
+# Decorator to count and time every call of a function while a profiler is active
+def instrumented(metric):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profiler = _active.get()
+            if profiler is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.record(metric, time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -0,0 +1,115 @@
+import copy
+
+import numpy as np
+
+from core import iter_regions
+
+# Number of bytes taken before and after a region as its signature anchors
+CONTEXT_LENGTH = 16
+# Anchors whose first bytes occur more often than this are treated as ambiguous without verifying them
+MAX_CANDIDATES = 4096
+
+# A sorted index of every 8-byte window of an image, built once and queried for many patterns.
+# Each entry packs the window's leading bytes with its position, so the index is a single sorted uint64 array.
+class ByteIndex:
+    __slots__ = ("data", "entries", "position_bits")
+
+    def __init__(self, data):
+        self.data = memoryview(data).toreadonly()
+        size = len(self.data)
+        windows = max(size - 7, 0)
+        self.position_bits = max(windows - 1, 1).bit_length()
+        keys = np.empty(windows, dtype=np.uint64)
+        # Big-endian windows sort in byte order; each residue class is read straight from the buffer
+        for start in range(min(8, windows)):
+            keys[start::8] = np.frombuffer(self.data, dtype=">u8", count=len(range(start, windows, 8)), offset=start)
+        shift = np.uint64(self.position_bits)
+        self.entries = np.sort((keys >> shift) << shift | np.arange(windows, dtype=np.uint64))
+
+    # Function to find where each pattern occurs, stopping once a pattern is known to be ambiguous
+    # Returns one array of positions per pattern; patterns shorter than 8 bytes never match
+    def find_all(self, patterns, limit=2):
+        shift = np.uint64(self.position_bits)
+        position_mask = np.uint64((1 << self.position_bits) - 1)
+        usable = [len(pattern) >= 8 for pattern in patterns]
+        keys = np.array([int.from_bytes(pattern[:8], "big") if ok else 0 for pattern, ok in zip(patterns, usable)], dtype=np.uint64)
+        low_keys = (keys >> shift) << shift
+        lows = np.searchsorted(self.entries, low_keys, side="left")
+        highs = np.searchsorted(self.entries, low_keys | position_mask, side="right")
+        results = []
+        for pattern, ok, low, high in zip(patterns, usable, lows, highs):
+            matches = []
+            if ok and high - low <= MAX_CANDIDATES:
+                length = len(pattern)
+                for position in np.sort(self.entries[low:high] & position_mask):
+                    position = int(position)
+                    if self.data[position:position + length] == pattern:
+                        matches.append(position)
+                        if len(matches) >= limit:
+                            break
+            elif ok:
+                # Too common to be a usable anchor; report it as ambiguous
+                matches = [-1] * limit
+            results.append(np.array(matches, dtype=np.int64))
+        return results
+
+# Function to build the anchors of a region in the reference image: (anchor bytes, offset of the region relative to the anchor)
+def region_anchors(reference, offset, length, context=CONTEXT_LENGTH):
+    anchors = []
+    # The region's own bytes, e.g. axis breakpoints, are the strongest signature
+    if length >= 8 and offset + length <= len(reference):
+        anchors.append((bytes(reference[offset:offset + length]), 0))
+    if offset - context >= 0:
+        anchors.append((bytes(reference[offset - context:offset]), context))
+    if offset + length + context <= len(reference):
+        anchors.append((bytes(reference[offset + length:offset + length + context]), -length))
+    return anchors
+
+# Function to locate every region of a definition in a target image and produce a relocated copy of the definition.
+# Regions are found by unique matches of their own bytes or the bytes around them in the reference image;
+# regions without a unique match take the shift of the nearest located region.
+def relocate_definition(json_data, reference, target, target_index=None):
+    reference = memoryview(reference)
+    if target_index is None:
+        target_index = ByteIndex(target)
+    regions = list(iter_regions(json_data))
+    anchors_per_region = [region_anchors(reference, offset, length) for _, _, _, offset, length in regions]
+    patterns = [pattern for anchors in anchors_per_region for pattern, _ in anchors]
+    matches = iter(target_index.find_all(patterns))
+
+    located = []
+    for (label, _, _, offset, length), anchors in zip(regions, anchors_per_region):
+        votes = {}
+        for _, relative in anchors:
+            found = next(matches)
+            if found.size == 1:
+                new_offset = int(found[0]) + relative
+                votes[new_offset] = votes.get(new_offset, 0) + 1
+        if votes:
+            new_offset = max(votes, key=votes.get)
+            located.append({"name": label, "old_offset": offset, "new_offset": new_offset, "status": "matched",
+                            "anchors_matched": votes[new_offset], "anchors": len(anchors)})
+        else:
+            located.append({"name": label, "old_offset": offset, "new_offset": None, "status": "unresolved",
+                            "anchors_matched": 0, "anchors": len(anchors)})
+
+    # Regions without a unique match take the shift of the nearest matched region
+    matched = sorted((entry["old_offset"], entry["new_offset"] - entry["old_offset"]) for entry in located if entry["status"] == "matched")
+    if matched:
+        matched_offsets = np.array([old for old, _ in matched])
+        for entry in located:
+            if entry["status"] != "unresolved":
+                continue
+            index = int(np.searchsorted(matched_offsets, entry["old_offset"]))
+            neighbours = [i for i in (index - 1, index) if 0 <= i < len(matched)]
+            nearest = min(neighbours, key=lambda i: abs(matched[i][0] - entry["old_offset"]))
+            entry["new_offset"] = entry["old_offset"] + matched[nearest][1]
+            entry["status"] = "inferred"
+
+    relocated = copy.deepcopy(json_data)
+    relocated_regions = list(iter_regions(relocated))
+    for (_, entry_dict, key, _, _), entry in zip(relocated_regions, located):
+        if entry["new_offset"] is not None:
+            entry_dict[key] = f"0x{entry['new_offset']:X}"
+        entry["shift"] = entry["new_offset"] - entry["old_offset"] if entry["new_offset"] is not None else None
+    return relocated, located
@@ -0,0 +1,76 @@
+import hashlib
+import mmap
+
+from core import build_patch, build_patched_binary, iter_patched_chunks
+
+# A read-only binary image with a sparse overlay of edits on top.
+# The original is never copied: files are memory-mapped and in-memory uploads are wrapped in a memoryview,
+# slices are zero-copy views, and the edited image is produced by streaming the original plus the overlay.
+class BinaryImage:
+    __slots__ = ("buffer", "_mmap", "_writes", "_patch")
+
+    def __init__(self, data, _mmap=None):
+        self.buffer = memoryview(data).toreadonly()
+        self._mmap = _mmap
+        self._writes = []
+        self._patch = None
+
+    # Function to open a file as a memory-mapped image
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            f.seek(0, 2)
+            if f.tell() == 0:
+                # Empty files cannot be memory-mapped
+                return cls(b"")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, _mmap=mapped)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Function to release the view and unmap the file
+    def close(self):
+        self.buffer.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Views handed out by view() are still alive; the mapping is closed when they are collected
+                pass
+            self._mmap = None
+
+    # Function to get a zero-copy view of the original bytes
+    def view(self, offset, length):
+        if offset < 0 or offset + length > len(self.buffer):
+            raise ValueError(f"Offset {hex(offset)} with length {length} exceeds binary file size.")
+        return self.buffer[offset:offset + length]
+
+    # Function to add (byte offsets, byte values) writes to the overlay
+    def write(self, writes):
+        self._writes.extend(writes)
+        self._patch = None
+
+    # Function to get the overlay as a patch of the changed bytes
+    def patch(self):
+        if self._patch is None:
+            self._patch = build_patch(self.buffer, self._writes)
+        return self._patch
+
+    # Function to iterate over the edited image without materializing it
+    def iter_chunks(self):
+        return iter_patched_chunks(self.buffer, self.patch())
+
+    # Function to build the edited image from one copy of the original, as a bytearray
+    def to_bytes(self):
+        return build_patched_binary(self.buffer, self.patch())
+
+    # Function to hash the original image without copying it
+    def source_sha256(self):
+        return hashlib.sha256(self.buffer).hexdigest()
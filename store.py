@@ -0,0 +1,76 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import profiling
+
+# Default memory budget of a content store
+DEFAULT_BUDGET = 512 << 20
+
+# Function to estimate the memory held by a stored value
+def size_of(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, memoryview):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return sys.getsizeof(value)
+
+# A thread-safe, content-addressed store of immutable values shared by every session of the process.
+# Keys must identify the content (e.g. a hash of the bytes it was built from); values are never modified after
+# they are stored. The least recently used entries are evicted once the stored values exceed the memory budget.
+class ContentStore:
+    __slots__ = ("budget", "nbytes", "hits", "misses", "evictions", "_entries", "_lock")
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (value, size), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    # Function to get a stored value, building and storing it with factory() on a miss
+    def get_or_create(self, key, factory):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                profiling.record("store_hit")
+                return entry[0]
+            self.misses += 1
+        profiling.record("store_miss")
+        # Built outside the lock so other sessions are not blocked; if two sessions race, the first stored value wins
+        value = factory()
+        size = size_of(value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0]
+            # Values larger than the whole budget are returned without being stored
+            if size <= self.budget:
+                self._entries[key] = (value, size)
+                self.nbytes += size
+                while self.nbytes > self.budget:
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self.nbytes -= evicted_size
+                    self.evictions += 1
+        return value
+
+    # Function to drop every entry
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
@@ -0,0 +1,31 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench import generate_binary  # noqa: E402
+
+# Path of the definition shipped with the repository
+DEFINITION_PATH = os.path.join(ROOT, "CNPNKM__FT5.json")
+
+
+# Random image bytes of a given size and seed, as the benchmarks generate them
+@pytest.fixture
+def random_image():
+    return generate_binary
+
+
+@pytest.fixture
+def definition_path():
+    return DEFINITION_PATH
+
+
+@pytest.fixture
+def definition_json():
+    with open(DEFINITION_PATH) as f:
+        return json.load(f)
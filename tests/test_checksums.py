@@ -0,0 +1,58 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from checksums import Crc32, compile_checksum, correct_checksum, crc32_shift, crc32_shift_tables
+from core import build_patch, build_patched_binary, byte_write
+
+
+@pytest.mark.parametrize("length", [1, 7, 4096, 65537])
+def test_shift_tables_append_zero_bytes(length):
+    crc = zlib.crc32(b"calibration")
+    assert crc32_shift(crc32_shift_tables(length), crc) ^ zlib.crc32(bytes(length)) == zlib.crc32(b"calibration" + bytes(length))
+
+
+@pytest.mark.parametrize("size, block_size", [(4096 * 3, 4096), (10000, 4096), (100, 4096), (5, 1)])
+def test_combined_block_crcs_match_zlib(size, block_size, random_image):
+    data = random_image(size)
+    crc = Crc32()
+    assert crc.combine(crc.partials(data, block_size), block_size, size) == zlib.crc32(data)
+
+
+def checksum(algorithm, **fields):
+    issues = []
+    layout = compile_checksum({"name": algorithm, "algorithm": algorithm, "start": "0x0", "end": "0x7ff8",
+                               "offset": "0x7ffc", **fields}, issues)
+    assert not issues
+    return layout
+
+
+def test_crc_after_an_incremental_patch_matches_zlib_of_the_output(random_image):
+    data = random_image(0x8000, seed=1)
+    layout = checksum("crc32", block_size=1024)
+    writes = [byte_write(0x10, b"\x01\x02\x03"), byte_write(0x4123, b"\xff" * 40)]
+    write, report = correct_checksum(data, build_patch(data, writes), layout)
+    assert report["dirty_blocks"] == 2
+    output = build_patched_binary(data, build_patch(data, writes + [byte_write(*write)]))
+    assert int.from_bytes(output[0x7ffc:0x8000], "little") == zlib.crc32(output[:0x7ff8])
+
+
+@pytest.mark.parametrize("variant", ["sum", "ones_complement", "twos_complement"])
+def test_sum16_after_an_incremental_patch(variant, random_image):
+    data = random_image(0x8000, seed=2)
+    layout = checksum("sum16", byteorder="big", variant=variant)
+    patch = build_patch(data, [byte_write(0x2000, b"\x12\x34\x56")])
+    write, _ = correct_checksum(data, patch, layout)
+    output = build_patched_binary(data, build_patch(data, [byte_write(0x2000, b"\x12\x34\x56"), byte_write(*write)]))
+    total = int(np.frombuffer(output[:0x7ff8], dtype=">u2").astype(np.uint64).sum()) & 0xFFFF
+    expected = {"sum": total, "ones_complement": ~total & 0xFFFF, "twos_complement": -total & 0xFFFF}[variant]
+    assert int.from_bytes(output[0x7ffc:0x7ffe], "big") == expected
+
+
+def test_unchanged_checksum_has_no_write(random_image):
+    data = bytearray(random_image(0x8000, seed=3))
+    data[0x7ffc:0x8000] = zlib.crc32(data[:0x7ff8]).to_bytes(4, "little")
+    write, report = correct_checksum(bytes(data), build_patch(bytes(data), []), checksum("crc32"))
+    assert write is None
+    assert report["old"] == report["new"]
@@ -0,0 +1,170 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from core import (
+    apply_patch,
+    build_patch,
+    build_patched_binary,
+    byte_write,
+    TableLayout,
+    compile_definition,
+    iter_patched_chunks,
+    patch_to_json,
+    reverse_scaling,
+    write_maps,
+    write_to_binary,
+)
+
+
+def test_later_writes_win_where_writes_overlap():
+    data = bytes(16)
+    patch = build_patch(data, [byte_write(2, b"\x01\x01\x01\x01"), byte_write(4, b"\x02\x02"), byte_write(3, b"\x03")])
+    assert bytes(build_patched_binary(data, patch))[:8] == b"\x00\x00\x01\x03\x02\x02\x00\x00"
+
+
+def test_writes_of_the_original_bytes_are_dropped():
+    data = bytes(range(16))
+    patch = build_patch(data, [byte_write(4, bytes([4, 5, 99, 7])), byte_write(10, bytes([10]))])
+    assert patch.positions.tolist() == [6]
+    assert patch.old.tolist() == [6]
+    assert patch.new.tolist() == [99]
+    assert patch.changed_bytes == 1
+
+
+def test_write_restoring_an_earlier_write_leaves_no_change():
+    data = bytes(8)
+    patch = build_patch(data, [byte_write(1, b"\x05"), byte_write(1, b"\x00")])
+    assert patch.changed_bytes == 0
+    assert patch.regions == 0
+
+
+def test_array_writes_match_a_per_byte_reference():
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 256, 4096, dtype=np.uint8).tobytes()
+    writes = []
+    expected = bytearray(data)
+    for _ in range(200):
+        positions = rng.integers(0, 4096, rng.integers(1, 20)).astype(np.int64)
+        values = rng.integers(0, 256, positions.size, dtype=np.uint8)
+        writes.append((positions, values))
+        for position, value in zip(positions.tolist(), values.tolist()):
+            expected[position] = value
+    patch = build_patch(data, writes)
+    assert bytes(build_patched_binary(data, patch)) == bytes(expected)
+    assert b"".join(iter_patched_chunks(data, patch)) == bytes(expected)
+    assert patch.changed_bytes == sum(a != b for a, b in zip(data, expected))
+
+
+def test_patch_json_round_trip():
+    data = bytes(range(256)) * 4
+    patch = build_patch(data, [byte_write(10, b"\xaa\xbb"), byte_write(500, b"\xcc")])
+    patch_json = patch_to_json(patch, "CAL", None, len(data))
+    assert len(json.loads(patch_json)["records"]) == patch.regions == 2
+    assert bytes(apply_patch(data, patch_json)) == bytes(build_patched_binary(data, patch))
+
+
+def test_negative_offsets_are_reported():
+    definition = compile_definition({"editable_maps": [
+        {"name": "Limit", "input_type": "slider", "offset": "-0x4", "length": 2, "data_type": "int16",
+         "min_value": 0, "max_value": 10, "step": 1},
+    ]})
+    assert definition.editable_maps == []
+    assert [level for level, _ in definition.issues] == ["error"]
+    with pytest.raises(ValueError):
+        write_to_binary(bytes(8), [], -4, struct.Struct("<H"), 1, None)
+
+
+def table_layout(name, offset, rows, columns, dtype, scaling=None, editable_mask=None):
+    dtype = np.dtype(dtype)
+    if editable_mask is None:
+        editable_mask = np.ones((rows, columns), dtype=bool)
+    return TableLayout(name, "", dtype.name, offset, rows, columns, dtype, scaling, editable_mask)
+
+
+# Function to write tables one cell at a time with struct, rejecting a whole map if any of its cells does not fit
+def per_cell_write(binary_data, tables):
+    modified = bytearray(binary_data)
+    for layout, table in tables:
+        codec = struct.Struct("<" + layout.dtype.char)
+        cells = []
+        try:
+            for row in range(layout.rows):
+                for column in range(layout.columns):
+                    value = float(table[row, column])
+                    if not layout.editable_mask[row, column] or np.isnan(value):
+                        continue
+                    if layout.scaling:
+                        value = reverse_scaling(value, *layout.scaling)
+                    if layout.dtype.kind in "iu":
+                        value = round(value)
+                    cells.append((layout.offset + (row * layout.columns + column) * codec.size, codec.pack(value)))
+        except struct.error:
+            continue
+        for offset, packed in cells:
+            modified[offset:offset + len(packed)] = packed
+    return bytes(modified)
+
+
+def apply_writes(binary_data, writes):
+    return bytes(build_patched_binary(binary_data, build_patch(binary_data, writes)))
+
+
+def test_write_maps_matches_per_cell_writes_across_dtypes_and_scalings(random_image):
+    rng = np.random.default_rng(1)
+    data = random_image(4096, seed=5)
+    layouts = [
+        table_layout("u16 scaled", 0, 4, 6, "<u2", (0.5, 10)),
+        table_layout("i16", 100, 3, 3, "<i2"),
+        table_layout("u8 offset", 200, 2, 8, "u1", (1, -20)),
+        table_layout("u16", 300, 5, 2, "<u2"),
+        table_layout("i32 scaled", 400, 2, 2, "<i4", (0.01, 0)),
+        table_layout("f32 scaled", 500, 3, 4, "<f4", (2, 1)),
+        table_layout("u8 partial", 600, 3, 3, "u1", None, np.eye(3, dtype=bool)),
+    ]
+    tables = []
+    for layout in layouts:
+        raw = np.frombuffer(data, dtype=layout.dtype, count=layout.rows * layout.columns, offset=layout.offset)
+        # Move every cell by a few raw steps, staying inside the cell type's range
+        raw = raw.astype(np.float64) + rng.integers(-3, 4, raw.size)
+        if layout.dtype.kind in "iu":
+            info = np.iinfo(layout.dtype)
+            raw = np.clip(raw, info.min, info.max)
+        table = raw.reshape(layout.rows, layout.columns)
+        if layout.scaling:
+            table = table * layout.scaling[0] + layout.scaling[1]
+        table[rng.random(table.shape) < 0.2] = np.nan
+        tables.append((layout, table))
+    writes, issues = [], []
+    write_maps(data, writes, tables, issues)
+    assert issues == []
+    output = apply_writes(data, writes)
+    assert output != data
+    assert output == per_cell_write(data, tables)
+
+
+def test_write_maps_rejects_only_the_map_with_out_of_range_cells():
+    data = bytes(64)
+    good = table_layout("good", 0, 2, 2, "<u2")
+    bad = table_layout("bad", 16, 2, 2, "<u2")
+    tables = [(good, np.full((2, 2), 7.0)), (bad, np.array([[1.0, 2.0], [70000.0, 3.0]]))]
+    writes, issues = [], []
+    write_maps(data, writes, tables, issues)
+    assert issues == [("error", "Error writing map 'bad': 1 cell(s) are outside the range 0..65535 of uint16.")]
+    output = apply_writes(data, writes)
+    assert output == per_cell_write(data, tables)
+    assert output[16:24] == bytes(8)
+
+
+def test_write_maps_leaves_nan_and_read_only_cells_untouched():
+    data = bytes(range(16))
+    mask = np.array([[True, False], [True, True]])
+    layout = table_layout("partial", 0, 2, 2, "<u2", None, mask)
+    writes, issues = [], []
+    write_maps(data, writes, [(layout, np.array([[500.0, 600.0], [np.nan, 700.0]]))], issues)
+    output = np.frombuffer(apply_writes(data, writes), dtype="<u2")
+    original = np.frombuffer(data, dtype="<u2")
+    assert output[:4].tolist() == [500, original[1], original[2], 700]
+    assert output[4:].tolist() == original[4:].tolist()
@@ -0,0 +1,65 @@
+from history import EditJournal
+
+
+def record(journal, name, cell, old, new):
+    journal.stage(name, [cell], [old], [new])
+    assert journal.commit()
+
+
+def test_undo_redo_replay_the_step_deltas():
+    journal = EditJournal()
+    journal.stage("a", [0, 3], [1.0, 2.0], [5.0, 6.0])
+    journal.stage("b", [1], [10.0], [11.0])
+    journal.commit()
+    undo = {name: (cells.tolist(), values.tolist()) for name, cells, values in journal.undo()}
+    assert undo == {"a": ([0, 3], [1.0, 2.0]), "b": ([1], [10.0])}
+    redo = {name: (cells.tolist(), values.tolist()) for name, cells, values in journal.redo()}
+    assert redo == {"a": ([0, 3], [5.0, 6.0]), "b": ([1], [11.0])}
+
+
+def test_commit_without_changes_records_no_step():
+    journal = EditJournal()
+    journal.stage("a", [], [], [])
+    assert not journal.commit()
+    assert journal.revision == 0
+
+
+def test_new_step_drops_redo_history():
+    journal = EditJournal()
+    record(journal, "a", 0, 0.0, 1.0)
+    record(journal, "a", 0, 1.0, 2.0)
+    journal.undo()
+    record(journal, "a", 0, 1.0, 3.0)
+    assert journal.last_revision == 2
+    assert not journal.can_redo
+
+
+def test_oldest_steps_are_evicted_by_step_count():
+    journal = EditJournal(max_steps=3)
+    for step in range(5):
+        record(journal, "a", step, 0.0, 1.0)
+    assert (journal.first_revision, journal.revision, journal.last_revision) == (2, 5, 5)
+    changes = journal.jump(0)
+    assert journal.revision == 2
+    assert [cells.tolist() for _, cells, _ in changes] == [[4], [3], [2]]
+    assert not journal.can_undo
+
+
+def test_oldest_steps_are_evicted_by_delta_count():
+    journal = EditJournal(max_deltas=4)
+    journal.stage("a", [0, 1, 2], [0.0] * 3, [1.0] * 3)
+    journal.commit()
+    journal.stage("a", [3, 4], [0.0] * 2, [1.0] * 2)
+    journal.commit()
+    assert journal.first_revision == 1
+    assert journal.nbytes == 2 * (4 + 4 + 8 + 8) + 8
+
+
+def test_jump_replays_steps_in_order():
+    journal = EditJournal()
+    for value in (1.0, 2.0, 3.0):
+        record(journal, "a", 0, value - 1, value)
+    assert [values.tolist() for _, _, values in journal.jump(1)] == [[2.0], [1.0]]
+    assert journal.revision == 1
+    assert [values.tolist() for _, _, values in journal.jump(10)] == [[2.0], [3.0]]
+    assert journal.revision == 3
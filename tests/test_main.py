@@ -0,0 +1,103 @@
+import json
+import os
+import textwrap
+
+import pytest
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+# Function to start the editor with the uploads replaced by files on disk; the definition defaults to the shipped one
+@pytest.fixture
+def open_editor(tmp_path, definition_path, random_image):
+    def open_editor(definition_json=None):
+        json_path = definition_path
+        if definition_json is not None:
+            json_path = str(tmp_path / "definition.json")
+            with open(json_path, "w") as f:
+                json.dump(definition_json, f)
+        binary_path = tmp_path / "stock.bin"
+        binary_path.write_bytes(random_image(2424832, seed=4))
+        script = tmp_path / "app.py"
+        script.write_text(textwrap.dedent(f"""
+            import io, runpy
+            import streamlit as st
+            files = {{"Upload JSON File": {json_path!r}, "Upload Binary File": {str(binary_path)!r}}}
+            def file_uploader(label, *args, **kwargs):
+                uploaded = io.BytesIO(open(files[label], "rb").read())
+                uploaded.name = uploaded.file_id = files[label]
+                return uploaded
+            st.file_uploader = file_uploader
+            runpy.run_path({MAIN_PATH!r}, run_name="__main__")
+        """))
+        at = AppTest.from_file(str(script), default_timeout=60).run()
+        # Render every section so every slider and map editor is mounted
+        return at.toggle[0].set_value(False).run()
+
+    return open_editor
+
+
+def save(at):
+    [button for button in at.button if button.label == "Save Changes"][0].click().run()
+    job = at.session_state["save_job"][1]
+    job.join()
+    assert job.error is None
+    return job.result
+
+
+def test_save_without_edits_changes_nothing(open_editor):
+    editor = open_editor()
+    assert not editor.exception
+    # The random image holds slider values outside their ranges, which the sliders show clamped
+    assert any(slider.value in (slider.min, slider.max) for slider in editor.slider)
+    result = save(editor)
+    assert result.patch.changed_bytes == 0
+    assert not [message for level, message in result.issues if level == "error"]
+
+
+def test_save_writes_a_moved_slider(open_editor):
+    editor = open_editor()
+    slider = editor.slider(key="Engine_Speed_Limit_Map_1")
+    slider.set_value(slider.min + slider.step).run()
+    result = save(editor)
+    assert 0 < result.patch.changed_bytes <= 2
+
+
+def test_resampled_and_shared_maps_are_relabelled_with_the_new_breakpoints(open_editor, definition_json):
+    # Make the ignition maps, which share their X axis, fully editable so they can be resampled
+    for group in definition_json["map_groups"]:
+        for item in group["maps"]:
+            if item["name"].startswith("Ignition_Advance_Map"):
+                item["map_dimension"].pop("editable_region", None)
+                item["map_dimension"]["editable_columns"] = "all"
+    editor = open_editor(definition_json)
+    name = "Ignition_Advance_Map_1"
+    old_labels = list(editor.session_state["edited_values"][name].columns)
+    editor.selectbox(key=f"tools:{name}:operation").set_value("Resample onto breakpoints").run()
+    x = editor.text_input(key=f"tools:{name}:x")
+    x.set_value(", ".join(f"{float(value) * 0.9:g}" for value in old_labels)).run()
+    editor.button(key=f"tools:{name}:apply").click().run()
+    assert not editor.exception and not editor.error
+
+    breakpoints = editor.session_state["edited_values"]["axis:0x23c6ee"]
+    new_labels = [f"{value:g}" for value in breakpoints]
+    assert new_labels != old_labels
+    for shared in ("Ignition_Advance_Map_1", "Ignition_Advance_Map_2"):
+        assert list(editor.session_state["edited_values"][shared].columns) == new_labels
+
+    [button for button in editor.button if button.label == "Undo"][0].click().run()
+    for shared in ("Ignition_Advance_Map_1", "Ignition_Advance_Map_2"):
+        assert list(editor.session_state["edited_values"][shared].columns) == old_labels
+
+
+def test_save_is_instrumented(open_editor):
+    editor = open_editor()
+    [toggle for toggle in editor.sidebar.toggle if toggle.label == "Instrumentation"][0].set_value(True).run()
+    slider = editor.slider(key="Engine_Speed_Limit_Map_1")
+    slider.set_value(slider.min + slider.step).run()
+    save(editor)
+    editor.run()
+    metrics = editor.session_state["profile_totals"].totals()
+    assert {"write_to_binary", "struct_pack", "encode_map"} <= metrics.keys()
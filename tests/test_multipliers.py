@@ -0,0 +1,73 @@
+import numpy as np
+
+from core import build_patch, build_patched_binary, collect_writes, compile_definition, multiply_maps, write_multipliers
+
+
+# Function to build a map_multiplier entry: an array of rows x columns cells, or a single value when rows is None
+def multiplier_map(name, offset, data_type, length, sign_type="unsigned", rows=None, columns=None):
+    item = {"name": name, "offset": hex(offset), "length": length, "data_type": data_type, "sign_type": sign_type,
+            "input_type": "map_multiplier"}
+    if rows is not None:
+        item["map_dimension"] = {"rows": rows, "columns": columns}
+    return item
+
+
+def compile_group(*maps):
+    definition = compile_definition({"map_groups": [{
+        "group_name": "Pop",
+        "maps": list(maps),
+        "control_slider": {"name": "Pop Control", "min_value": 0.5, "max_value": 3.0, "step": 0.1, "default_value": 1.0},
+    }]})
+    assert definition.issues == []
+    return definition
+
+
+def test_integer_cells_are_rounded_and_clamped():
+    definition = compile_group(multiplier_map("Pop", 0, "array", 4, rows=1, columns=4))
+    layout = definition.groups[0].maps[0]
+    data = bytes([3, 5, 100, 200])
+    [(old, new, clamped)] = multiply_maps(data, [layout], [1.5])
+    assert old.tolist() == [[3, 5, 100, 200]]
+    # 4.5 and 7.5 round half to even; 300 is clamped to the top of uint8
+    assert new.tolist() == [[4, 8, 150, 255]]
+    assert clamped == 1
+
+
+def test_signed_cells_clamp_to_the_bottom_of_their_range():
+    definition = compile_group(multiplier_map("Pop", 0, "array", 4, sign_type="signed", rows=1, columns=2))
+    layout = definition.groups[0].maps[0]
+    data = np.array([-20000, 1000], dtype="<i2").tobytes()
+    [(_, new, clamped)] = multiply_maps(data, [layout], [2.0])
+    assert new.tolist() == [[-32768, 2000]]
+    assert clamped == 1
+
+
+def test_single_value_multiplier_is_a_one_cell_table():
+    definition = compile_group(multiplier_map("Pop", 2, "int16", 2))
+    layout = definition.groups[0].maps[0]
+    assert (layout.rows, layout.columns) == (1, 1)
+    data = bytes(2) + np.array([1000], dtype="<u2").tobytes()
+    [(old, new, _)] = multiply_maps(data, [layout], [1.25])
+    assert (old.tolist(), new.tolist()) == ([[1000]], [[1250]])
+
+
+def test_clamped_cells_are_reported_and_written_clamped():
+    definition = compile_group(multiplier_map("Pop", 0, "array", 2, rows=1, columns=2))
+    layout = definition.groups[0].maps[0]
+    data = bytes([100, 200])
+    writes, issues = [], []
+    write_multipliers(data, writes, [(layout, 2.0)], issues)
+    assert issues == [("warning", "1 cell(s) of map 'Pop' were clamped to the range of uint8.")]
+    assert bytes(build_patched_binary(data, build_patch(data, writes))) == bytes([200, 255])
+
+
+def test_control_slider_scales_every_multiplier_of_its_group():
+    definition = compile_group(
+        multiplier_map("Pop 1", 0, "array", 4, rows=2, columns=2),
+        multiplier_map("Pop 2", 4, "int16", 2),
+    )
+    data = bytes([10, 20, 30, 40]) + np.array([500], dtype="<u2").tobytes()
+    writes, issues = collect_writes(data, definition, {"Pop Control": 2.0})
+    assert issues == []
+    output = bytes(build_patched_binary(data, build_patch(data, writes)))
+    assert output == bytes([20, 40, 60, 80]) + np.array([1000], dtype="<u2").tobytes()
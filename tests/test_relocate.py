@@ -0,0 +1,39 @@
+import numpy as np
+
+from relocate import ByteIndex, relocate_definition
+
+
+def test_entries_pack_leading_bytes_above_position(random_image):
+    data = random_image(1000)
+    index = ByteIndex(data)
+    mask = (1 << index.position_bits) - 1
+    positions = (index.entries & np.uint64(mask)).astype(np.int64)
+    assert sorted(positions.tolist()) == list(range(len(data) - 7))
+    for entry, position in zip(index.entries.tolist()[:50], positions.tolist()[:50]):
+        assert entry >> index.position_bits == int.from_bytes(data[position:position + 8], "big") >> index.position_bits
+    assert np.all(index.entries[1:] >= index.entries[:-1])
+
+
+def test_find_all_checks_candidates_against_the_full_pattern(random_image):
+    data = bytearray(random_image(5000, seed=1))
+    # Same first 8 bytes at two places, different tails
+    data[100:116] = b"ABCDEFGH" + b"12345678"
+    data[3000:3016] = b"ABCDEFGH" + b"87654321"
+    index = ByteIndex(bytes(data))
+    unique, repeated, missing, short = index.find_all([b"ABCDEFGH12345678", b"ABCDEFGH", b"ZZZZZZZZZZ", b"ABC"])
+    assert unique.tolist() == [100]
+    assert repeated.tolist() == [100, 3000]
+    assert missing.size == 0
+    assert short.size == 0
+
+
+def test_relocates_a_shifted_image(random_image, definition_json):
+    reference = random_image(2424832, seed=2)
+    shift = 0x1230
+    target = random_image(shift, seed=3) + reference[:-shift]
+    relocated, located = relocate_definition(definition_json, reference, target)
+    assert located
+    assert all(entry["status"] == "matched" and entry["shift"] == shift for entry in located)
+    first = relocated["map_groups"][0]["maps"][0]
+    original = definition_json["map_groups"][0]["maps"][0]
+    assert int(first["offset"], 16) == int(original["offset"], 16) + shift
@@ -0,0 +1,69 @@
+from validate import validate_definition
+
+
+def value(name, offset, length=2, data_type="int16"):
+    return {"name": name, "input_type": "readonly", "offset": hex(offset), "length": length, "data_type": data_type}
+
+
+def table(name, offset, rows, columns, cell_length=2, x_axis=None, **map_dimension):
+    item = {"name": name, "input_type": "map_editor", "offset": hex(offset), "length": rows * columns * cell_length,
+            "data_type": "array", "map_dimension": {"rows": rows, "columns": columns, **map_dimension}}
+    if x_axis is not None:
+        item["x_axis"] = {"start_offset": hex(x_axis), "data_type": "int16", "length": 2}
+    return item
+
+
+def errors(definition, binary_size=None):
+    return [message for level, message in validate_definition(definition, binary_size) if level == "error"]
+
+
+def test_disjoint_regions_pass():
+    assert validate_definition({"editable_maps": [value("A", 0), value("B", 2), table("T", 4, 2, 2)]}, 12) == []
+
+
+def test_overlap_is_reported_once_against_the_region_reaching_furthest():
+    definition = {"editable_maps": [table("Wide", 0, 4, 4), value("Inner", 4), value("Tail", 30)]}
+    assert errors(definition) == [
+        "'Inner' (0x4-0x5) overlaps 'Wide' (0x0-0x1f).",
+        "'Tail' (0x1e-0x1f) overlaps 'Wide' (0x0-0x1f).",
+    ]
+
+
+def test_identical_regions_are_errors():
+    assert errors({"editable_maps": [value("A", 8), value("B", 8)]}) == ["'B' (0x8-0x9) overlaps 'A' (0x8-0x9)."]
+
+
+def test_shared_axes_are_exempt():
+    definition = {"editable_maps": [table("T1", 0, 1, 4, x_axis=0x100), table("T2", 8, 1, 4, x_axis=0x100)]}
+    assert errors(definition) == []
+
+
+def test_axis_overlapping_a_map_is_an_error():
+    definition = {"editable_maps": [table("T1", 0, 1, 4, x_axis=0x4)]}
+    assert errors(definition) == ["'T1 x_axis' (0x4-0xb) overlaps 'T1' (0x0-0x7)."]
+
+
+def test_regions_past_the_end_of_the_binary_are_errors():
+    definition = {"editable_maps": [value("Inside", 0), value("Outside", 15)]}
+    assert errors(definition, 16) == ["'Outside' (0xf-0x10) lies outside the binary of 16 bytes."]
+    assert errors(definition) == []
+
+
+def test_cell_lengths_must_divide_into_the_cells():
+    item = table("T", 0, 2, 3)
+    item["length"] = 13
+    assert errors({"editable_maps": [item]}) == ["Map 'T' has length 13, which does not divide into its 2x3 cells."]
+
+
+def test_editable_region_outside_the_map_is_a_warning():
+    item = table("T", 0, 2, 2, editable_region={"start_row": 1, "end_row": 3})
+    assert validate_definition({"editable_maps": [item]}) == [
+        ("warning", "Editable region of map 'T' (rows 1-3, columns 0-1) is empty or outside its 2x2 cells."),
+    ]
+
+
+def test_axis_with_unsupported_type_and_string_length_is_skipped(definition_json):
+    axis = definition_json["map_groups"][0]["maps"][0]["x_axis"]
+    axis["data_type"] = "int24"
+    axis["length"] = "2"
+    assert errors(definition_json, 2424832) == []
@@ -0,0 +1,84 @@
+from checksums import ALGORITHMS
+from core import iter_items, iter_regions
+
+# Function to check that each table's length divides into its cells and that editable regions lie inside the map.
+# Invalid lengths, dimensions and editable regions are already reported when the definition is compiled.
+def check_cell_lengths(json_data, issues):
+    for item in iter_items(json_data):
+        name = item.get("name")
+        input_type = item.get("input_type")
+        length = item.get("length")
+        if not isinstance(length, int) or length <= 0:
+            continue
+        if input_type == "map_editor" or (input_type == "map_multiplier" and item.get("data_type") == "array"):
+            map_dimension = item.get("map_dimension", {})
+            if not isinstance(map_dimension, dict):
+                continue
+            rows = map_dimension.get("rows", 0)
+            columns = map_dimension.get("columns", 0)
+            if not isinstance(rows, int) or not isinstance(columns, int) or rows <= 0 or columns <= 0:
+                continue
+            if length % (rows * columns):
+                issues.append(("error", f"Map '{name}' has length {length}, which does not divide into its {rows}x{columns} cells."))
+            region = map_dimension.get("editable_region")
+            if isinstance(region, dict) and all(isinstance(value, int) for value in region.values()):
+                start_row = region.get("start_row", 0)
+                end_row = region.get("end_row", rows - 1)
+                start_column = region.get("start_column", 0)
+                end_column = region.get("end_column", columns - 1)
+                if not (0 <= start_row <= end_row < rows and 0 <= start_column <= end_column < columns):
+                    issues.append(("warning", f"Editable region of map '{name}' (rows {start_row}-{end_row}, columns {start_column}-{end_column}) "
+                                              f"is empty or outside its {rows}x{columns} cells."))
+
+# Function to iterate over the regions checksums are stored at: (label, entry dict, offset key, offset, length)
+def iter_checksum_regions(json_data):
+    for item in json_data.get("checksums", []):
+        if item.get("algorithm") not in ALGORITHMS:
+            continue
+        try:
+            yield f"Checksum {item.get('name')}", item, "offset", int(item.get("offset"), 16), ALGORITHMS[item["algorithm"]]().size
+        except (TypeError, ValueError):
+            pass
+
+# Function to warn about checksums stored inside the range of a checksum listed before them.
+# Checksums are corrected in the order they are listed, so the earlier one would cover a stale value.
+def check_checksum_order(json_data, issues):
+    ranges = []
+    for _, item, _, offset, size in iter_checksum_regions(json_data):
+        for name, start, end in ranges:
+            if offset < end and offset + size > start:
+                issues.append(("warning", f"Checksum '{item.get('name')}' is stored inside the range of checksum '{name}', which is listed "
+                                          f"before it and would be corrected over a stale value; list '{name}' after it."))
+        try:
+            ranges.append((item.get("name"), int(item.get("start"), 16), int(item.get("end"), 16)))
+        except (TypeError, ValueError):
+            pass
+
+# Function to find regions that overlap or run past the end of the image in one pass over the regions sorted by offset.
+# The sweep keeps the region reaching furthest so far, so each overlapping region is reported once.
+def check_regions(json_data, binary_size, issues):
+    regions = sorted(
+        (offset, offset + length, label, key == "start_offset")
+        for label, _, key, offset, length in (*iter_regions(json_data), *iter_checksum_regions(json_data))
+        if length > 0
+    )
+    holder = None
+    for start, end, label, is_axis in regions:
+        if start < 0 or (binary_size is not None and end > binary_size):
+            issues.append(("error", f"'{label}' ({hex(start)}-{hex(end - 1)}) lies outside the binary of {binary_size} bytes."))
+        if holder is not None and start < holder[1]:
+            holder_start, holder_end, holder_label, holder_is_axis = holder
+            # Maps commonly share their axes; any other overlap, identical regions included, would write the same bytes twice
+            if not ((start, end) == (holder_start, holder_end) and is_axis and holder_is_axis):
+                issues.append(("error",
+                               f"'{label}' ({hex(start)}-{hex(end - 1)}) overlaps '{holder_label}' ({hex(holder_start)}-{hex(holder_end - 1)})."))
+        if holder is None or end > holder[1]:
+            holder = (start, end, label, is_axis)
+
+# Function to validate every region of a raw JSON definition; binary_size enables the bounds check
+def validate_definition(json_data, binary_size=None):
+    issues = []
+    check_cell_lengths(json_data, issues)
+    check_regions(json_data, binary_size, issues)
+    check_checksum_order(json_data, issues)
+    return issues